@@ -0,0 +1,32 @@
+"""measurements (date, id) index for keyset pagination
+
+Revision ID: 2aae3dd4d910
+Revises: 1a89f40fc28c
+Create Date: 2026-10-16 13:41:05.218870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2aae3dd4d910'
+down_revision: Union[str, Sequence[str], None] = '1a89f40fc28c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (date, id) serves both date filters and the keyset seek,
+    # so the single-column date index is no longer needed
+    op.create_index('ix_measurements_date_id', 'measurements', ['date', 'id'], unique=False)
+    op.drop_index(op.f('ix_measurements_date'), table_name='measurements')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_measurements_date'), 'measurements', ['date'], unique=False)
+    op.drop_index('ix_measurements_date_id', table_name='measurements')
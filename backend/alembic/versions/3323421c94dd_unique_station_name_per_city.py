@@ -0,0 +1,58 @@
+"""unique station name per city
+
+Revision ID: 3323421c94dd
+Revises: de68255a2e17
+Create Date: 2026-10-17 09:14:26.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3323421c94dd'
+down_revision: Union[str, Sequence[str], None] = 'de68255a2e17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Parallel uploads could create the same station twice - merge every
+    # duplicate into the oldest station of its (city, name)
+    op.execute("""
+        CREATE TEMP TABLE station_merge ON COMMIT DROP AS
+        SELECT id, min(id) OVER (PARTITION BY city_id, name) AS keep_id
+        FROM stations
+        WHERE name IS NOT NULL
+    """)
+    op.execute("DELETE FROM station_merge WHERE id = keep_id")
+    # A cell stored under several copies keeps its latest row, as in ac02de6a04b6
+    op.execute("""
+        DELETE FROM measurements m
+        USING measurements newer, station_merge a, station_merge b
+        WHERE m.pollutant_id = newer.pollutant_id
+          AND m.date = newer.date
+          AND m.id < newer.id
+          AND a.keep_id = b.keep_id
+          AND (m.station_id = a.id OR m.station_id = a.keep_id)
+          AND (newer.station_id = b.id OR newer.station_id = b.keep_id)
+    """)
+    op.execute("""
+        UPDATE measurements m SET station_id = s.keep_id
+        FROM station_merge s WHERE m.station_id = s.id
+    """)
+    op.execute("""
+        UPDATE latest_measurements l SET station_id = s.keep_id
+        FROM station_merge s WHERE l.station_id = s.id
+    """)
+    op.execute("DELETE FROM stations USING station_merge s WHERE stations.id = s.id")
+
+    op.create_index('ix_stations_city_id_name', 'stations', ['city_id', 'name'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stations_city_id_name', table_name='stations')
@@ -0,0 +1,48 @@
+"""create latest_measurements table
+
+Revision ID: 9b2d405fabc1
+Revises: e7660eab1b01
+Create Date: 2026-10-16 15:41:07.218834
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b2d405fabc1'
+down_revision: Union[str, Sequence[str], None] = 'e7660eab1b01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('latest_measurements',
+    sa.Column('city_id', sa.Integer(), nullable=False),
+    sa.Column('pollutant_id', sa.Integer(), nullable=False),
+    sa.Column('station_id', sa.Integer(), nullable=True),
+    sa.Column('date', sa.Date(), nullable=True),
+    sa.Column('value', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['city_id'], ['cities.id'], ),
+    sa.ForeignKeyConstraint(['pollutant_id'], ['pollutants.id'], ),
+    sa.ForeignKeyConstraint(['station_id'], ['stations.id'], ),
+    sa.PrimaryKeyConstraint('city_id', 'pollutant_id')
+    )
+    # Backfill from the measurements already loaded; ingestion keeps it current from here on
+    op.execute("""
+        INSERT INTO latest_measurements (city_id, pollutant_id, station_id, date, value)
+        SELECT DISTINCT ON (s.city_id, m.pollutant_id)
+               s.city_id, m.pollutant_id, m.station_id, m.date, m.value
+        FROM measurements m
+        JOIN stations s ON s.id = m.station_id
+        WHERE m.date IS NOT NULL
+        ORDER BY s.city_id, m.pollutant_id, m.date DESC, m.station_id DESC
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('latest_measurements')
@@ -0,0 +1,48 @@
+"""unique measurement key and covering index
+
+Revision ID: ac02de6a04b6
+Revises: ca9fd674a05c
+Create Date: 2026-10-16 10:12:41.532107
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ac02de6a04b6'
+down_revision: Union[str, Sequence[str], None] = 'ca9fd674a05c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Old uploads could store the same cell twice - keep the latest row
+    op.execute("""
+        DELETE FROM measurements m
+        USING measurements newer
+        WHERE m.station_id = newer.station_id
+          AND m.pollutant_id = newer.pollutant_id
+          AND m.date = newer.date
+          AND m.id < newer.id
+    """)
+    # Unique key for ON CONFLICT upserts; INCLUDE (value) makes it covering,
+    # so station/pollutant/date lookups and aggregates can be index-only scans
+    op.create_index(
+        'ix_measurements_station_pollutant_date',
+        'measurements',
+        ['station_id', 'pollutant_id', 'date'],
+        unique=True,
+        postgresql_include=['value'],
+    )
+    # City filters always go through stations.city_id
+    op.create_index(op.f('ix_stations_city_id'), 'stations', ['city_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_stations_city_id'), table_name='stations')
+    op.drop_index('ix_measurements_station_pollutant_date', table_name='measurements')
@@ -0,0 +1,50 @@
+"""add quantile sketch to daily_rollups
+
+Revision ID: de68255a2e17
+Revises: 9b2d405fabc1
+Create Date: 2026-10-16 16:37:52.661420
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'de68255a2e17'
+down_revision: Union[str, Sequence[str], None] = '9b2d405fabc1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('daily_rollups', sa.Column('sketch', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    # Backfill the sketches; the bucket mapping must match app/sketch.py
+    # (relative accuracy 0.01, values up to 1e-06 in the "z" bucket,
+    # Infinity and NaN left out as in the rollups)
+    op.execute("""
+        UPDATE daily_rollups r SET sketch = b.sketch
+        FROM (
+            SELECT city_id, pollutant_id, date, jsonb_object_agg(bucket, n) AS sketch
+            FROM (
+                SELECT s.city_id, m.pollutant_id, m.date,
+                       CASE WHEN m.value <= 1e-06 THEN 'z'
+                            ELSE ceil(ln(m.value) / 0.020000666706669435)::int::text END AS bucket,
+                       count(*) AS n
+                FROM measurements m
+                JOIN stations s ON s.id = m.station_id
+                WHERE m.date IS NOT NULL AND m.value > '-Infinity' AND m.value < 'Infinity'
+                GROUP BY 1, 2, 3, 4
+            ) buckets
+            GROUP BY 1, 2, 3
+        ) b
+        WHERE (r.city_id, r.pollutant_id, r.date) = (b.city_id, b.pollutant_id, b.date)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('daily_rollups', 'sketch')
@@ -0,0 +1,50 @@
+"""create daily_rollups table
+
+Revision ID: e7660eab1b01
+Revises: 2aae3dd4d910
+Create Date: 2026-10-16 15:02:18.904113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7660eab1b01'
+down_revision: Union[str, Sequence[str], None] = '2aae3dd4d910'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('daily_rollups',
+    sa.Column('city_id', sa.Integer(), nullable=False),
+    sa.Column('pollutant_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('sum', sa.Float(), nullable=True),
+    sa.Column('count', sa.Integer(), nullable=True),
+    sa.Column('min', sa.Float(), nullable=True),
+    sa.Column('max', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['city_id'], ['cities.id'], ),
+    sa.ForeignKeyConstraint(['pollutant_id'], ['pollutants.id'], ),
+    sa.PrimaryKeyConstraint('city_id', 'pollutant_id', 'date')
+    )
+    # Backfill from the measurements already loaded; ingestion keeps it current from here on.
+    # Infinity and NaN are left out, as ingestion does
+    op.execute("""
+        INSERT INTO daily_rollups (city_id, pollutant_id, date, sum, count, min, max)
+        SELECT s.city_id, m.pollutant_id, m.date,
+               sum(m.value), count(m.value), min(m.value), max(m.value)
+        FROM measurements m
+        JOIN stations s ON s.id = m.station_id
+        WHERE m.date IS NOT NULL AND m.value > '-Infinity' AND m.value < 'Infinity'
+        GROUP BY s.city_id, m.pollutant_id, m.date
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_rollups')
@@ -1,124 +1,248 @@
 # backend/app/ai.py
-import os
-import pickle
-import numpy as np
+# numpy (and sklearn, via unpickling) are imported on first use, so importing
+# the app stays fast; see model_registry.py for when the models are loaded
 from datetime import timedelta, date
+from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from .models import Measurement, Station, City, Pollutant
+from sqlalchemy import select, func
+from .models import Measurement, Station, City, Pollutant, LatestMeasurement
 from .schemas import MeasurementOut
+from .cache import data_versions
+from .inference import inference_service
+from .model_registry import model_registry
+
+
+class ModelsWarming(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=503, detail={"status": "warming", "detail": "Models are still loading"},
+                         headers={"Retry-After": "2"})
+
+
+def active_models():
+    """
+    The loaded model bundle. The API loads it in the background at startup
+    and raises ModelsWarming until that is done; scripts that never started
+    the registry load it here, on first use.
+    """
+    if model_registry.state == "cold":
+        model_registry.load()
+    elif model_registry.state == "warming":
+        raise ModelsWarming()
+    return model_registry.active
+
+
+def models_swapped(bundle):
+    """Cached forecasts and statuses came from the previous models."""
+    data_versions.bump()
+
+
+# Number of previous values the forecasting model uses as features
+LAGS = 3
+
+
+async def fetch_lag_history(session: AsyncSession, city_id: int, date_from: date, lags: int = LAGS):
+    """
+    Last `lags` values before date_from of every pollutant in the city, in one
+    windowed query: [(pollutant_code, [val_t-1, val_t-2, ...]), ...]
+    Pollutants with a shorter history are left out.
+    Note: This assumes continuous daily data; gaps are not filled.
+    """
+    ranked = (
+        select(
+            Measurement.pollutant_id,
+            Measurement.value,
+            func.row_number().over(
+                partition_by=Measurement.pollutant_id,
+                order_by=(Measurement.date.desc(), Measurement.id.desc()),
+            ).label("rn"),
+        )
+        .join(Station, Measurement.station_id == Station.id)
+        .where(Station.city_id == city_id)
+        .where(Measurement.date < date_from)
+        .subquery()
+    )
+    stmt = (
+        select(Pollutant.code, ranked.c.value)
+        .join(ranked, ranked.c.pollutant_id == Pollutant.id)
+        .where(ranked.c.rn <= lags)
+        .order_by(Pollutant.id, ranked.c.rn)
+    )
+    result = await session.execute(stmt)
+
+    history = {}
+    for code, value in result.all():
+        history.setdefault(code, []).append(value)
+    return [(code, values) for code, values in history.items() if len(values) == lags]
+
+
+def predict_horizon(model, features, days: int):
+    """
+    Recursive multi-step prediction. features has one row per pollutant:
+    [pollutant_encoded, lag_1, lag_2, lag_3]; returns (pollutants x days).
+    """
+    import numpy as np
+
+    features = features.copy()
+    predictions = np.empty((len(features), max(days, 0)))
+    for step in range(days):
+        predictions[:, step] = model.predict(features)
+        # The prediction becomes lag_1, the other lags shift by one
+        features[:, 2:] = features[:, 1:-1]
+        features[:, 1] = predictions[:, step]
+    return predictions
 
-# Absolute paths
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_PATH = os.path.join(BASE_DIR, "model.pkl")
-ENCODER_PATH = os.path.join(BASE_DIR, "label_encoder.pkl")
-QUALITY_MODEL_PATH = os.path.join(BASE_DIR, "quality_models.pkl")
-
-# Load model and encoder
-try:
-    with open(MODEL_PATH, "rb") as f:
-        model = pickle.load(f)
-    with open(ENCODER_PATH, "rb") as f:
-        label_encoder = pickle.load(f)
-except FileNotFoundError:
-    model = None
-    label_encoder = None
-    print("⚠️ Model or Label Encoder not found. Forecasting will not work.")
-
-try:
-    with open(QUALITY_MODEL_PATH, "rb") as f:
-        quality_models = pickle.load(f)
-except FileNotFoundError:
-    quality_models = None
-    print("⚠️ Quality Models not found. Falling back to simple heuristics if needed (or failing).")
 
 async def make_forecast(session: AsyncSession, city_id: int, date_from: date, date_to: date):
+    """
+    Recursive forecast of every pollutant in the city from date_from to date_to.
+    All pollutants are predicted together: one model call per day.
+    """
+    # Every request uses one bundle, even if a new version is swapped in meanwhile
+    bundle = active_models()
+    model, label_encoder = bundle.model, bundle.label_encoder
     if not model or not label_encoder:
         return []
 
-    # 1. Get all pollutants for the city (to forecast for each)
-    # We only care about pollutants that actually have data in this city
+    history = await fetch_lag_history(session, city_id, date_from)
+    # Only pollutants known to the encoder can be forecast
+    history = [(code, lags) for code, lags in history if code in label_encoder.classes_]
+    if not history:
+        return []
+
+    import numpy as np
+
+    codes = [code for code, _ in history]
+    # Features: [pollutant_encoded, lag_1, lag_2, lag_3], one row per pollutant,
+    # where lag_1 is t-1
+    features = np.column_stack([
+        label_encoder.transform(codes),
+        np.array([lags for _, lags in history], dtype=float),
+    ])
+
+    days = (date_to - date_from).days + 1
+    # The model calls run in the inference pool, off the event loop
+    predictions = await inference_service.run(predict_horizon, model, features, days)
+
+    forecast_results = []
+    for row, code in enumerate(codes):
+        for step in range(days):
+            forecast_results.append(MeasurementOut(
+                city="", # Filled later or not needed for chart if we just use value/date
+                station="Forecast",
+                pollutant=code,
+                date=date_from + timedelta(days=step),
+                value=float(predictions[row, step])
+            ))
+
+    return forecast_results
+
+STATUS_LABELS = ["Good", "Moderate", "Unhealthy", "Very Unhealthy", "Hazardous"]
+
+STATUS_COLORS = {
+    "Good": "#10b981", # emerald-500
+    "Moderate": "#f59e0b", # amber-500
+    "Unhealthy": "#ef4444", # red-500
+    "Very Unhealthy": "#7f1d1d", # red-900
+    "Hazardous": "#581c87", # purple-900
+    "Unknown": "#9ca3af"
+}
+
+
+async def fetch_latest_values(session: AsyncSession, city_ids: list) -> dict:
+    """
+    Latest value of every pollutant for each city, read from the
+    latest_measurements table by primary key: {city_id: {pollutant_code: value}}
+    """
     stmt = (
-        select(Pollutant)
-        .join(Measurement, Measurement.pollutant_id == Pollutant.id)
-        .join(Station, Measurement.station_id == Station.id)
-        .where(Station.city_id == city_id)
-        .distinct()
+        select(LatestMeasurement.city_id, Pollutant.code, LatestMeasurement.value)
+        .join(Pollutant, LatestMeasurement.pollutant_id == Pollutant.id)
+        .where(LatestMeasurement.city_id.in_(city_ids))
+        .order_by(LatestMeasurement.city_id, LatestMeasurement.pollutant_id)
     )
     result = await session.execute(stmt)
-    pollutants = result.scalars().all()
 
-    forecast_results = []
-    lags = 3
-
-    for pollutant in pollutants:
-        try:
-            # Check if pollutant is known to the encoder
-            if pollutant.code not in label_encoder.classes_:
-                continue
-            
-            pollutant_encoded = label_encoder.transform([pollutant.code])[0]
-
-            # 2. Get historical data for the lags (last 3 days before date_from)
-            # We need the last 'lags' measurements.
-            # Note: This assumes continuous daily data. If gaps exist, this simple logic might take older data.
-            # For a robust system, we should fill gaps. Here we just take the last 3 records.
-            
-            history_stmt = (
-                select(Measurement)
-                .join(Station, Measurement.station_id == Station.id)
-                .where(Station.city_id == city_id)
-                .where(Measurement.pollutant_id == pollutant.id)
-                .where(Measurement.date < date_from)
-                .order_by(Measurement.date.desc())
-                .limit(lags)
-            )
-            history_res = await session.execute(history_stmt)
-            history_measurements = history_res.scalars().all()
-            
-            # We need exactly 3 values. If not enough history, skip.
-            if len(history_measurements) < lags:
-                continue
-            
-            # History comes in desc order (yesterday, day before...), we need [t-1, t-2, t-3]
-            # Our model was trained on [lag_1, lag_2, lag_3] where lag_1 is t-1.
-            # So we need values: [val_t-1, val_t-2, val_t-3]
-            
-            current_lags = [m.value for m in history_measurements] # [val_t-1, val_t-2, val_t-3]
-            
-            # 3. Recursive Forecasting
-            current_date = date_from
-            while current_date <= date_to:
-                # Prepare features: [pollutant_encoded, lag_1, lag_2, lag_3]
-                features = np.array([pollutant_encoded] + current_lags).reshape(1, -1)
-                
-                # Predict
-                pred_value = model.predict(features)[0]
-                
-                # Store result
-                forecast_results.append(MeasurementOut(
-                    city="", # Filled later or not needed for chart if we just use value/date
-                    station="Forecast",
-                    pollutant=pollutant.code,
-                    date=current_date,
-                    value=float(pred_value)
-                ))
-                
-                # Update lags for next iteration
-                # New lag_1 is the prediction
-                # New lag_2 is old lag_1
-                # New lag_3 is old lag_2
-                current_lags = [pred_value] + current_lags[:-1]
-                
-                current_date += timedelta(days=1)
-                
-        except Exception as e:
-            print(f"Error forecasting for {pollutant.code}: {e}")
+    latest = {city_id: {} for city_id in city_ids}
+    for city_id, code, value in result.all():
+        latest[city_id][code] = value
+    return latest
+
+
+def centroid_scores(codes: list, values: list, quality_models: dict):
+    """
+    Quality score (0=Good, ..., 4=Hazardous) of each (pollutant code, value)
+    pair, in one pass: every value is compared with the padded centroid row
+    of its pollutant and gets the index of the nearest one.
+    Pollutants without a quality model score 0 (Good).
+    """
+    import numpy as np
+
+    scores = np.zeros(len(values), dtype=int)
+    if not quality_models or not len(values):
+        return scores
+
+    known = sorted(code for code in set(codes) if code in quality_models)
+    if not known:
+        return scores
+    width = max(len(quality_models[code]["centroids"]) for code in known)
+    table = np.full((len(known), width), np.inf)
+    for row, code in enumerate(known):
+        centroids = np.asarray(quality_models[code]["centroids"], dtype=float).ravel()
+        table[row, :len(centroids)] = centroids
+
+    rows = {code: row for row, code in enumerate(known)}
+    mask = np.array([code in rows for code in codes])
+    row_idx = np.array([rows[code] for code in codes if code in rows])
+    vals = np.asarray(values, dtype=float)[mask]
+
+    # The index of the nearest centroid corresponds to the rank (0..4)
+    nearest = np.argmin(np.abs(table[row_idx] - vals[:, None]), axis=1)
+    # Safety cap if k > 5
+    scores[mask] = np.minimum(nearest, len(STATUS_LABELS) - 1)
+    return scores
+
+
+def classify_air_quality_many(latest: dict, quality_models: dict) -> dict:
+    """
+    Status dict (see classify_air_quality) for every key of
+    {key: {pollutant_code: latest value}}, scored in one vectorized pass.
+    """
+    keys, codes, values = [], [], []
+    for key, latest_values in latest.items():
+        for code, value in latest_values.items():
+            keys.append(key)
+            codes.append(code)
+            values.append(value)
+    scores = centroid_scores(codes, values, quality_models)
+
+    # The worst pollutant of every key; the first one wins a tie
+    worst = {}
+    for key, code, score in zip(keys, codes, scores):
+        if score > worst.get(key, (0, "-"))[0]:
+            worst[key] = (int(score), code)
+
+    statuses = {}
+    for key, latest_values in latest.items():
+        if not latest_values:
+            statuses[key] = {
+                "status": "Unknown",
+                "color": STATUS_COLORS["Unknown"], # gray
+                "description": "No recent data available",
+                "main_pollutant": "-"
+            }
             continue
 
-    return forecast_results
+        score, main_pollutant = worst.get(key, (0, "-"))
+        label = STATUS_LABELS[score]
+        statuses[key] = {
+            "status": label,
+            "color": STATUS_COLORS.get(label, "#9ca3af"),
+            "description": f"Air quality is {label.lower()} (determined by AI analysis of {main_pollutant}).",
+            "main_pollutant": main_pollutant
+        }
+    return statuses
 
-async def get_current_air_quality_status(session: AsyncSession, city_id: int) -> dict:
+
+def classify_air_quality(latest_values: dict, quality_models: dict) -> dict:
     """
     Returns a general status dict:
     {
@@ -127,93 +251,17 @@ async def get_current_air_quality_status(session: AsyncSession, city_id: int) ->
         "description": string,
         "main_pollutant": string
     }
-    Based on the latest measurements for the city.
+    for {pollutant_code: latest value}. The worst pollutant, by the K-Means
+    quality centroids, decides the status.
     """
-    # Get latest measurements for each pollutant in this city
-    # We'll just take the last 24h or simply the very last record for each pollutant
-    
-    stmt = (
-        select(Measurement, Pollutant)
-        .join(Pollutant, Measurement.pollutant_id == Pollutant.id)
-        .join(Station, Measurement.station_id == Station.id)
-        .where(Station.city_id == city_id)
-        .order_by(Measurement.date.desc())
-    )
-    
-    # We need to be careful not to fetch millions of rows. 
-    # Ideally we'd use a subquery to get max date per pollutant, but for now let's fetch a reasonable limit 
-    # and filter in python for the "latest" of each type.
-    result = await session.execute(stmt.limit(100)) 
-    rows = result.all() # [(Measurement, Pollutant), ...]
-    
-    if not rows:
-        return {
-            "status": "Unknown",
-            "color": "#9ca3af", # gray
-            "description": "No recent data available",
-            "main_pollutant": "-"
-        }
+    return classify_air_quality_many({None: latest_values}, quality_models)[None]
 
-    # Find latest value for each pollutant
-    latest_values = {} # code -> value
-    
-    for m, p in rows:
-        if p.code not in latest_values:
-            latest_values[p.code] = m.value
-            
-    # ML-Based Classification (K-Means)
-    # We use the trained centroids to determine which cluster the value belongs to.
-    # Clusters are sorted: 0=Good, ..., 4=Hazardous
-    
-    worst_status_score = 0
-    worst_status_label = "Good"
-    main_pollutant = "-"
-    
-    status_labels = ["Good", "Moderate", "Unhealthy", "Very Unhealthy", "Hazardous"]
-    
-    status_colors = {
-        "Good": "#10b981", # emerald-500
-        "Moderate": "#f59e0b", # amber-500
-        "Unhealthy": "#ef4444", # red-500
-        "Very Unhealthy": "#7f1d1d", # red-900
-        "Hazardous": "#581c87", # purple-900
-        "Unknown": "#9ca3af"
-    }
-    
-    for code, val in latest_values.items():
-        # Default to Good if no model found
-        score = 0
-        
-        if quality_models and code in quality_models:
-            qm = quality_models[code]
-            # qm has "centroids" sorted.
-            # We find the closest centroid.
-            # Or better: since they are 1D and sorted, we can just find the nearest index.
-            
-            centroids = qm["centroids"]
-            # Calculate distance to each centroid
-            distances = np.abs(centroids - val)
-            closest_cluster_idx = np.argmin(distances)
-            
-            # The index in 'centroids' corresponds to the rank (0..4)
-            score = closest_cluster_idx
-            
-            # Safety cap if k < 5
-            if score >= len(status_labels):
-                score = len(status_labels) - 1
-        else:
-            # Fallback if model missing for this pollutant? 
-            # Maybe just skip or assume Good.
-            pass
-            
-        if score > worst_status_score:
-            worst_status_score = score
-            worst_status_label = status_labels[score]
-            main_pollutant = code
-            
-    return {
-        "status": worst_status_label,
-        "color": status_colors.get(worst_status_label, "#9ca3af"),
-        "description": f"Air quality is {worst_status_label.lower()} (determined by AI analysis of {main_pollutant}).",
-        "main_pollutant": main_pollutant
-    }
\ No newline at end of file
+
+async def get_current_air_quality_status(session: AsyncSession, city_id: int) -> dict:
+    """
+    Status of a city based on the latest measurement of each pollutant
+    (see classify_air_quality).
+    """
+    quality_models = active_models().quality_models
+    latest = await fetch_latest_values(session, [city_id])
+    return await inference_service.run(classify_air_quality, latest[city_id], quality_models)
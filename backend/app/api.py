@@ -1,15 +1,37 @@
 # backend/app/api.py
-from fastapi import APIRouter, UploadFile, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, Depends, HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from .db import get_session
-from .models import City, Station, Pollutant, Measurement
-import pandas as pd
-import io
-from datetime import datetime
+from typing import List
+from .db import SessionLocal, get_session
+from .ingest import (
+    META_COLUMNS, SNIFF_BYTES, iter_file_chunks, is_xlsx, melt_measurements,
+    find_ingested_file, refresh_changed, register_file, sniff_csv_format,
+    upsert_records, write_measurements
+)
+from .cache import data_versions
+from .jobs import IngestJob, ingest_queue
+from .models import Station, Pollutant
+from .schemas import IngestJobOut, MeasurementCreate
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from datetime import date, datetime, timezone
 
 router = APIRouter()
 
+# Size of the reads used to copy an upload to disk
+UPLOAD_COPY_BYTES = 1024 * 1024
+
+# Records validated and written together by /measurements/batch
+BATCH_RECORDS = 5000
+
+measurement_list = TypeAdapter(List[MeasurementCreate])
+measurement_item = TypeAdapter(MeasurementCreate)
+
 import re
 
 # Mapping for Ukrainian months in filenames
@@ -104,130 +126,267 @@ def parse_header_date(header: str, default_year: int, default_month: int):
     return None
 
 
-@router.post("/upload-csv/")
+def map_date_columns(columns, file_year: int, file_month: int) -> dict:
+    """
+    Maps each date column header to its date. Other headers are left out.
+    Spreadsheet headers may already be dates.
+    """
+    date_columns = {}
+    for col in columns:
+        if col in META_COLUMNS:
+            continue
+        if isinstance(col, datetime):
+            date_columns[col] = col.date()
+            continue
+        if isinstance(col, date):
+            date_columns[col] = col
+            continue
+        m_date = parse_header_date(str(col), file_year, file_month)
+        if m_date:
+            date_columns[col] = m_date
+    return date_columns
+
+
+async def ingest_csv_job(job: IngestJob):
+    """
+    Parses a stored CSV or .xlsx upload chunk by chunk and writes it in one transaction;
+    rollups and latest values are refreshed in a short one after it.
+    Parsing runs in a worker thread so the event loop stays free.
+    Only cells whose value changed are written, and the file is added
+    to the ingestion registry in the same transaction.
+    """
+    file_year, file_month = parse_month_year_from_filename(job.filename)
+
+    async with SessionLocal() as session:
+        # An identical upload may have finished while this one was queued
+        if await find_ingested_file(session, job.content_hash):
+            job.status = "skipped"
+            # Its refresh may be the one that failed
+            refreshed = await refresh_changed(session)
+            if refreshed:
+                data_versions.bump(refreshed)
+            return
+
+        with open(job.path, "rb") as fh:
+            chunks = iter_file_chunks(fh)
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                # Worksheets of one workbook may have different headers
+                date_columns = map_date_columns(chunk.columns, file_year, file_month)
+                frame = await asyncio.to_thread(melt_measurements, chunk, date_columns)
+
+                processed, changed = await write_measurements(session, frame)
+                job.rows_written += processed
+                job.rows_changed += changed
+                job.rejected_cells += frame.attrs.get("rejected_cells", 0)
+                if "progress" in chunk.attrs:
+                    # .xlsx: the file position is meaningless inside the zip
+                    job.bytes_read = int(chunk.attrs["progress"] * job.total_bytes)
+                else:
+                    job.bytes_read = fh.tell()
+
+        await register_file(
+            session, job.content_hash, job.filename, file_year, file_month,
+            rows_processed=job.rows_written, rows_changed=job.rows_changed,
+        )
+        await session.commit()
+
+        refreshed = await refresh_changed(session)
+        if refreshed:
+            data_versions.bump(refreshed)
+
+
+def job_out(job: IngestJob) -> IngestJobOut:
+    def ts(value):
+        return datetime.fromtimestamp(value, tz=timezone.utc) if value is not None else None
+
+    return IngestJobOut(
+        id=job.id,
+        filename=job.filename,
+        status=job.status,
+        progress=round(job.progress, 4),
+        rows_written=job.rows_written,
+        rows_changed=job.rows_changed,
+        rejected_cells=job.rejected_cells,
+        error=job.error,
+        created_at=ts(job.created_at),
+        started_at=ts(job.started_at),
+        finished_at=ts(job.finished_at),
+        duration_seconds=job.duration_seconds,
+    )
+
+
+@router.post("/upload-csv/", status_code=202, response_model=IngestJobOut)
 async def upload_csv(file: UploadFile, session: AsyncSession = Depends(get_session)):
-    content = await file.read()
     filename = file.filename or ""
-    
-    # Extract default year/month from filename
-    file_year, file_month = parse_month_year_from_filename(filename)
-    
-    # Detect encoding and separator
-    # Priority: UTF-8 -> CP1251, Semicolon -> Comma
-    encodings = ["utf-8", "cp1251"]
-    separators = [";", ","]
-    df = None
-    
-    for encoding in encodings:
-        for sep in separators:
-            try:
-                temp_df = pd.read_csv(io.BytesIO(content), sep=sep, encoding=encoding)
-                # Heuristic: Valid file should have multiple columns
-                if len(temp_df.columns) > 1:
-                    df = temp_df
-                    break
-            except Exception:
-                continue
-        if df is not None:
-            break
-            
-    if df is None:
+
+    # Reject files we can't parse right away, before queueing them
+    sample = await file.read(SNIFF_BYTES)
+    if not is_xlsx(sample) and sniff_csv_format(sample) is None:
         raise HTTPException(
             status_code=400, 
-            detail="Failed to parse CSV. Please ensure the file is encoded in UTF-8 or CP1251 and uses ';' or ',' as separator."
+            detail="Failed to parse file. Please upload .xlsx, or CSV encoded in UTF-8 or CP1251 with ';' or ',' as separator."
         )
 
-    inserted = 0
-
-    for _, row in df.iterrows():
-        # Clean up basic fields
-        # Using .get with defaults to avoid KeyErrors if columns are slightly different, 
-        # but relying on user's schema mostly.
-        city_name = str(row.get("city", "")).strip()
-        station_name = str(row.get("coordinateNumber", "")).strip()
-        pollutant_name = str(row.get("nameImpurity", "")).strip()
-        
-        if not city_name or city_name == "nan": continue
-        if not station_name or station_name == "nan": continue
-        if not pollutant_name or pollutant_name == "nan": continue
-
-        # Get or create City
-        q_city = await session.execute(select(City).where(City.name == city_name))
-        city = q_city.scalar_one_or_none()
-        if not city:
-            city = City(name=city_name)
-            session.add(city)
-            await session.flush()
-
-        # Get or create Station
-        q_station = await session.execute(select(Station).where(Station.name == station_name, Station.city_id == city.id))
-        station = q_station.scalar_one_or_none()
-        if not station:
-            station = Station(name=station_name, city_id=city.id)
-            session.add(station)
-            await session.flush()
-
-        # Get or create Pollutant
-        q_pol = await session.execute(select(Pollutant).where(Pollutant.code == pollutant_name))
-        pollutant = q_pol.scalar_one_or_none()
-        if not pollutant:
-            pollutant = Pollutant(code=pollutant_name, description=pollutant_name)
-            session.add(pollutant)
-            await session.flush()
-
-        # Iterate over columns to find date columns
-        for col in df.columns:
-            # Skip metadata columns
-            if col in ["city", "coordinateNumber", "nameImpurity", "yearMonth"]:
-                continue
-                
-            # Try to parse date from header
-            m_date = parse_header_date(col, file_year, file_month)
-            if not m_date:
-                continue
-
-            # Parse value
-            raw_val = str(row[col]).replace(",", ".").strip()
-            if raw_val in ["", "-", "nan", "null", "None"]:
-                continue
-            
-            try:
-                # Remove < > if present
-                clean_val = raw_val.replace("<", "").replace(">", "")
-                value = float(clean_val)
-            except ValueError:
-                continue
-
-            # Create Measurement
-            # Check if exists? For bulk upload usually we just insert. 
-            # If we want to avoid duplicates, we should check. 
-            # For now, let's assume we just append or the user handles cleanup.
-            # Or better: check if exists to avoid PK violation if unique constraint exists.
-            # Assuming no strict unique constraint on (station, pollutant, date) for now based on previous code,
-            # but usually there should be one.
-            
-            # Let's check if measurement exists to update it or insert new
-            # (Optional improvement, but good for idempotency)
-            q_meas = await session.execute(select(Measurement).where(
-                Measurement.station_id == station.id,
-                Measurement.pollutant_id == pollutant.id,
-                Measurement.date == m_date
-            ))
-            existing_meas = q_meas.scalar_one_or_none()
-            
-            if existing_meas:
-                existing_meas.value = value
-            else:
-                measurement = Measurement(
-                    station_id=station.id,
-                    pollutant_id=pollutant.id,
-                    date=m_date,
-                    value=value
-                )
-                session.add(measurement)
-            
-            inserted += 1
+    # The upload is gone once the request ends, so keep a copy for the worker.
+    # The content hash is computed on the way.
+    total_bytes = 0
+    digest = hashlib.sha256()
+    suffix = ".xlsx" if is_xlsx(sample) else ".csv"
+    with tempfile.NamedTemporaryFile(prefix="ingest-", suffix=suffix, delete=False) as tmp:
+        while sample:
+            await asyncio.to_thread(tmp.write, sample)
+            digest.update(sample)
+            total_bytes += len(sample)
+            sample = await file.read(UPLOAD_COPY_BYTES)
+
+    job = IngestJob(filename=filename, path=tmp.name, total_bytes=total_bytes, content_hash=digest.hexdigest())
+
+    # Same bytes were ingested before - nothing to do
+    if await find_ingested_file(session, job.content_hash):
+        os.remove(tmp.name)
+        job.status = "skipped"
+        job.started_at = job.finished_at = time.time()
+        return job_out(ingest_queue.record(job))
+
+    ingest_queue.submit(job, ingest_csv_job)
+    return job_out(job)
+
+
+@router.get("/ingest-jobs/{job_id}", response_model=IngestJobOut)
+async def get_ingest_job(job_id: str):
+    job = ingest_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_out(job)
+
+
+def _error_detail(err: dict, loc: tuple, **extra) -> dict:
+    # json_invalid errors carry the raw bytes as input
+    if isinstance(err.get("input"), bytes):
+        err = {**err, "input": err["input"].decode("utf-8", "replace")}
+    return {**err, "loc": loc, **extra}
+
+
+def validate_measurements(raw: bytes, offset: int = 0) -> List[MeasurementCreate]:
+    """
+    Validates a JSON array of measurements in one call.
+    Error locations are shifted by offset so they point at the record in the whole request.
+    """
+    try:
+        return measurement_list.validate_json(raw)
+    except ValidationError as e:
+        errors = []
+        for err in e.errors(include_url=False, include_context=False):
+            loc = err["loc"]
+            if loc and isinstance(loc[0], int):
+                loc = (loc[0] + offset,) + tuple(loc[1:])
+            errors.append(_error_detail(err, loc))
+        raise HTTPException(status_code=422, detail=errors)
+
+
+def validate_ndjson_lines(lines: list, offset: int = 0) -> List[MeasurementCreate]:
+    """
+    Validates (line number, line) pairs, each line as exactly one record.
+    Error locations start with the record index shifted by offset, like
+    validate_measurements, and carry the line number of the body.
+    """
+    items = []
+    errors = []
+    for index, (line_number, line) in enumerate(lines):
+        try:
+            items.append(measurement_item.validate_json(line))
+        except ValidationError as e:
+            for err in e.errors(include_url=False, include_context=False):
+                errors.append(_error_detail(err, (offset + index,) + tuple(err["loc"]), line=line_number))
+    if errors:
+        raise HTTPException(status_code=422, detail=errors)
+    return items
 
-    await session.commit()
-    return {"rows_processed": inserted, "filename_parsed": f"{file_year}-{file_month}"}
 
+async def iter_ndjson_lines(request: Request, size: int):
+    """
+    Yields lists of at most size (line number, line) pairs of the non-empty
+    lines of a streamed NDJSON body. Line numbers start at 1.
+    """
+    buffer = b""
+    lines = []
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            line_number += 1
+            if line.strip():
+                lines.append((line_number, line))
+        while len(lines) >= size:
+            yield lines[:size]
+            lines = lines[size:]
+    if buffer.strip():
+        lines.append((line_number + 1, buffer))
+    if lines:
+        yield lines
+
+
+async def write_measurement_batch(session: AsyncSession, items: List[MeasurementCreate]):
+    """
+    Writes one validated batch. Returns (processed records, changed rows).
+    """
+    records = [(m.station_id, m.pollutant_id, m.date, m.value) for m in items]
+
+    # Check references for the whole batch at once
+    station_ids = {r[0] for r in records}
+    pollutant_ids = {r[1] for r in records}
+    res = await session.execute(select(Station.id).where(Station.id.in_(station_ids)))
+    unknown_stations = station_ids - set(res.scalars().all())
+    res = await session.execute(select(Pollutant.id).where(Pollutant.id.in_(pollutant_ids)))
+    unknown_pollutants = pollutant_ids - set(res.scalars().all())
+    if unknown_stations or unknown_pollutants:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "unknown_station_ids": sorted(unknown_stations),
+                "unknown_pollutant_ids": sorted(unknown_pollutants),
+            },
+        )
+
+    changed = await upsert_records(session, records)
+    return len(records), changed
+
+
+@router.post("/measurements/batch")
+async def ingest_measurement_batch(request: Request, session: AsyncSession = Depends(get_session)):
+    """
+    Accepts a JSON array of MeasurementCreate records, or NDJSON
+    (Content-Type: application/x-ndjson) with one record per line.
+    NDJSON bodies are streamed, validated and written chunk by chunk.
+    All records are written in one transaction.
+    """
+    content_type = request.headers.get("content-type", "")
+    processed = 0
+    changed = 0
+
+    try:
+        if "ndjson" in content_type or "jsonlines" in content_type:
+            async for lines in iter_ndjson_lines(request, BATCH_RECORDS):
+                items = validate_ndjson_lines(lines, offset=processed)
+                rows, rows_changed = await write_measurement_batch(session, items)
+                processed += rows
+                changed += rows_changed
+        else:
+            items = validate_measurements(await request.body())
+            for start in range(0, len(items), BATCH_RECORDS):
+                rows, rows_changed = await write_measurement_batch(session, items[start:start + BATCH_RECORDS])
+                processed += rows
+                changed += rows_changed
+    except HTTPException:
+        await session.rollback()
+        raise
+
+    await session.commit()
+    refreshed = await refresh_changed(session)
+    if refreshed:
+        data_versions.bump(refreshed)
+    return {"rows_processed": processed}
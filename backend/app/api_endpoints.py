@@ -1,16 +1,30 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, and_, or_, true, tuple_, cast, literal_column, Date, DateTime, Integer
 from typing import Optional, List
 from datetime import date
+import base64
+import csv
+import io
+import json
 
-from .db import get_session
-from .models import City, Station, Pollutant, Measurement, User
+from .db import get_session, SessionLocal
+from .cache import response_cache, data_versions, not_modified
+from .columnar import negotiate, encode_columns
+from .downsample import lttb_indices
+from .sketch import QuantileSketch, RELATIVE_ACCURACY
+from .models import City, Station, Pollutant, Measurement, DailyRollup, User
 from .schemas import (
-    CityBase, StationBase, PollutantBase, MeasurementOut, StatsOut,
+    CityBase, StationBase, PollutantBase, MeasurementOut, StatsOut, BucketOut,
+    StatsBatchRequest, StatsBatchOut, StatsSeriesOut, WindowStatsOut,
+    DistributionOut, PercentileOut, HistogramBinOut,
     UserCreate, UserRead, Token, LoginRequest, StationCreate, StationRead
 )
-from .ai import make_forecast, get_current_air_quality_status
+from .ai import make_forecast, get_current_air_quality_status, models_swapped
+from .model_registry import model_registry
+from .inference import inference_service
+from .reports import build_reports, build_statuses, rollup_aggregates
 from .auth import (
     get_password_hash, verify_password, create_access_token,
     get_current_user, get_current_admin_user, ACCESS_TOKEN_EXPIRE_MINUTES
@@ -21,6 +35,51 @@ from fastapi import HTTPException, status
 
 router = APIRouter()
 
+
+# Rows fetched from the server-side cursor per round trip when exporting
+EXPORT_BATCH_ROWS = 5000
+
+# Bucket sizes for /measurements/buckets (date_trunc fields)
+BUCKETS = ["day", "week", "month", "year"]
+
+# Quantiles reported by /stats/distribution when none are requested
+DEFAULT_QUANTILES = [0.5, 0.95, 0.99]
+
+# Date windows accepted by one /stats/batch request (each adds 4 aggregates)
+MAX_STATS_WINDOWS = 24
+
+
+def filter_measurements(query, city_id=None, station_id=None, pollutant_id=None,
+                        date_from=None, date_to=None):
+    """Applies the common measurement filters to a query joined with Station."""
+    if city_id:
+        query = query.where(Station.city_id == city_id)
+    if station_id:
+        query = query.where(Measurement.station_id == station_id)
+    if pollutant_id:
+        query = query.where(Measurement.pollutant_id == pollutant_id)
+    if date_from:
+        query = query.where(Measurement.date >= date_from)
+    if date_to:
+        query = query.where(Measurement.date <= date_to)
+    return query
+
+
+def encode_cursor(m_date: date, measurement_id: int) -> str:
+    """Opaque keyset cursor pointing at the last row of a page."""
+    raw = f"{m_date.isoformat()}:{measurement_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date_str, id_str = raw.split(":")
+        return date.fromisoformat(date_str), int(id_str)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 # ---- Auth ----
 @router.post("/auth/register", response_model=Token)
 async def register(user: UserCreate, session: AsyncSession = Depends(get_session)):
@@ -91,14 +150,26 @@ async def delete_user(
 
 # ---- 1. Міста ----
 @router.get("/cities/", response_model=List[CityBase])
-async def get_cities(session: AsyncSession = Depends(get_session)):
-    result = await session.execute(select(City))
-    return result.scalars().all()
+async def get_cities(request: Request, response: Response, session: AsyncSession = Depends(get_session)):
+    unchanged = not_modified(request, response)
+    if unchanged:
+        return unchanged
+
+    async def load():
+        result = await session.execute(select(City))
+        return result.scalars().all()
+
+    return await response_cache.get_or_compute(("cities",), load)
 
 # ---- 2. Станції у місті ----
 # ---- 2. Станції у місті ----
 @router.get("/cities/{city_id}/stations/", response_model=List[StationRead])
-async def get_stations(city_id: int, session: AsyncSession = Depends(get_session)):
+async def get_stations(city_id: int, request: Request, response: Response,
+                       session: AsyncSession = Depends(get_session)):
+    unchanged = not_modified(request, response, city_id)
+    if unchanged:
+        return unchanged
+
     result = await session.execute(select(Station).where(Station.city_id == city_id))
     return result.scalars().all()
 
@@ -111,6 +182,7 @@ async def create_station(
     db_station = Station(**station.dict(), owner_id=current_user.id)
     session.add(db_station)
     await session.commit()
+    data_versions.bump([db_station.city_id])
     await session.refresh(db_station)
     return db_station
 
@@ -128,19 +200,30 @@ async def delete_station(
     if current_user.role != "admin" and station.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this station")
     
+    city_id = station.city_id
     await session.delete(station)
     await session.commit()
+    data_versions.bump([city_id])
     return {"ok": True}
 
 # ---- 3. Полютанти ----
 @router.get("/pollutants/", response_model=List[PollutantBase])
-async def get_pollutants(session: AsyncSession = Depends(get_session)):
-    result = await session.execute(select(Pollutant))
-    return result.scalars().all()
+async def get_pollutants(request: Request, response: Response, session: AsyncSession = Depends(get_session)):
+    unchanged = not_modified(request, response)
+    if unchanged:
+        return unchanged
+
+    async def load():
+        result = await session.execute(select(Pollutant))
+        return result.scalars().all()
+
+    return await response_cache.get_or_compute(("pollutants",), load)
 
 # ---- 4. Вимірювання з фільтрами ----
 @router.get("/measurements/", response_model=List[MeasurementOut])
 async def get_measurements(
+    request: Request,
+    response: Response,
     city_id: Optional[int] = None,
     station_id: Optional[int] = None,
     pollutant_id: Optional[int] = None,
@@ -148,44 +231,167 @@ async def get_measurements(
     date_to: Optional[date] = Query(None),
     limit: int = 500,
     offset: int = 0,
+    cursor: Optional[str] = None,
     session: AsyncSession = Depends(get_session),
 ):
+    """
+    Pages are ordered by (date, id) descending. Pass the X-Next-Cursor header
+    of a response as `cursor` to get the next page; seeking by cursor costs the
+    same for every page, unlike `offset` (kept for old clients).
+
+    Send `Accept: application/vnd.apache.arrow.stream`,
+    `Accept: application/vnd.apache.arrow.file` or
+    `Accept: application/vnd.apache.parquet` to get the page as a columnar table.
+    """
+    # Only the needed columns - no ORM entities per row
     query = (
-        select(Measurement, Station, City, Pollutant)
+        select(Measurement.id, City.name, Station.name, Pollutant.code, Measurement.date, Measurement.value)
         .join(Station, Measurement.station_id == Station.id)
         .join(City, Station.city_id == City.id)
         .join(Pollutant, Measurement.pollutant_id == Pollutant.id)
     )
 
-    if city_id:
-        query = query.where(City.id == city_id)
-    if station_id:
-        query = query.where(Station.id == station_id)
-    if pollutant_id:
-        query = query.where(Pollutant.id == pollutant_id)
-    if date_from:
-        query = query.where(Measurement.date >= date_from)
-    if date_to:
-        query = query.where(Measurement.date <= date_to)
+    query = filter_measurements(query, city_id, station_id, pollutant_id, date_from, date_to)
 
-    # Sort by date descending (latest first)
-    query = query.order_by(Measurement.date.desc())
-    
-    # Apply limit and offset
-    query = query.offset(offset).limit(limit)
+    # Sort by date descending (latest first); id breaks ties so the order is stable
+    query = query.order_by(Measurement.date.desc(), Measurement.id.desc())
+
+    # Seek past the previous page, or fall back to offset
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        query = query.where(tuple_(Measurement.date, Measurement.id) < tuple_(after_date, after_id))
+    elif offset:
+        query = query.offset(offset)
+    query = query.limit(limit)
 
     result = await session.execute(query)
     rows = result.all()
 
+    # The body depends on Accept; shared caches must key on it
+    headers = {"Vary": "Accept"}
+    # A full page may have a next one (limit=0 returns an empty page, as before)
+    if rows and len(rows) == limit:
+        last_id, _, _, _, last_date, _ = rows[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last_date, last_id)
+
+    media_type = negotiate(request.headers.get("accept"))
+    if media_type:
+        ids, cities, stations, pollutants, dates, values = zip(*rows) if rows else ([],) * 6
+        try:
+            content = encode_columns(
+                {"city": cities, "station": stations, "pollutant": pollutants, "date": dates, "value": values},
+                media_type,
+            )
+        except ImportError:
+            raise HTTPException(status_code=406, detail="Columnar formats are not available (pyarrow is not installed)")
+        return Response(content=content, media_type=media_type, headers=headers)
+
+    response.headers.update(headers)
     return [
-        MeasurementOut(
-            city=city.name,
-            station=station.name,
-            pollutant=pollutant.code,
-            date=m.date,
-            value=m.value
+        MeasurementOut(city=city, station=station, pollutant=pollutant, date=m_date, value=value)
+        for _, city, station, pollutant, m_date, value in rows
+    ]
+
+@router.get("/measurements/export")
+async def export_measurements(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    city_id: Optional[int] = None,
+    station_id: Optional[int] = None,
+    pollutant_id: Optional[int] = None,
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+):
+    """
+    Streams every matching measurement as CSV or NDJSON, oldest first.
+    Rows come from a server-side cursor in batches, so memory stays flat
+    and the first bytes are sent before the query has finished.
+    """
+    query = (
+        select(City.name, Station.name, Pollutant.code, Measurement.date, Measurement.value)
+        .join(Station, Measurement.station_id == Station.id)
+        .join(City, Station.city_id == City.id)
+        .join(Pollutant, Measurement.pollutant_id == Pollutant.id)
+    )
+    query = filter_measurements(query, city_id, station_id, pollutant_id, date_from, date_to)
+    query = query.order_by(Measurement.date, Measurement.id)
+    columns = ["city", "station", "pollutant", "date", "value"]
+
+    def to_csv(rows, header=False):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(columns)
+        writer.writerows(rows)
+        return buffer.getvalue()
+
+    def to_ndjson(rows):
+        return "".join(
+            json.dumps({"city": c, "station": s, "pollutant": p, "date": d.isoformat(), "value": v}, ensure_ascii=False) + "\n"
+            for c, s, p, d, v in rows
         )
-        for m, station, city, pollutant in rows
+
+    async def generate():
+        if format == "csv":
+            yield to_csv([], header=True)
+        # The request's session is closed before streaming starts, so use our own
+        async with SessionLocal() as session:
+            result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_ROWS))
+            async for rows in result.partitions():
+                yield to_csv(rows) if format == "csv" else to_ndjson(rows)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="measurements.{format}"'},
+    )
+
+@router.get("/measurements/buckets", response_model=List[BucketOut])
+async def get_measurement_buckets(
+    bucket: str = Query("day", pattern="^(day|week|month|year)$"),
+    city_id: Optional[int] = None,
+    station_id: Optional[int] = None,
+    pollutant_id: Optional[int] = None,
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    points: Optional[int] = Query(None, ge=3),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    avg/min/max/count per day, week, month or year, aggregated in SQL.
+    With `points`, longer series are thinned to that many buckets
+    with largest-triangle-three-buckets on the average.
+    """
+    # bucket is validated above, so it is safe to inline; a bind parameter would
+    # render differently in SELECT and GROUP BY
+    period = cast(
+        func.date_trunc(literal_column(f"'{bucket}'"), cast(Measurement.date, DateTime)),
+        Date,
+    ).label("bucket")
+
+    query = (
+        select(
+            period,
+            func.avg(Measurement.value),
+            func.min(Measurement.value),
+            func.max(Measurement.value),
+            func.count(Measurement.value),
+        )
+        .join(Station, Measurement.station_id == Station.id)
+    )
+    query = filter_measurements(query, city_id, station_id, pollutant_id, date_from, date_to)
+    query = query.group_by(period).order_by(period)
+
+    result = await session.execute(query)
+    rows = result.all()
+
+    if points and len(rows) > points:
+        keep = lttb_indices([r[0].toordinal() for r in rows], [r[1] for r in rows], points)
+        rows = [rows[i] for i in keep]
+
+    return [
+        BucketOut(date=d, avg=avg, min=min_val, max=max_val, count=count)
+        for d, avg, min_val, max_val, count in rows
     ]
 
 # ---- 5. Статистика ----
@@ -197,23 +403,15 @@ async def get_stats(
     date_to: Optional[date] = None,
     session: AsyncSession = Depends(get_session),
 ):
-    query = (
-        select(
-            func.avg(Measurement.value).label("avg"),
-            func.min(Measurement.value).label("min"),
-            func.max(Measurement.value).label("max"),
-        )
-        .join(Station, Measurement.station_id == Station.id)
-        .join(City, Station.city_id == City.id)
-        .where(Measurement.pollutant_id == pollutant_id)
-    )
+    # Answered from the daily rollups, so the cost depends on the number of days, not rows
+    query = select(*rollup_aggregates()).where(DailyRollup.pollutant_id == pollutant_id)
 
     if city_id:
-        query = query.where(City.id == city_id)
+        query = query.where(DailyRollup.city_id == city_id)
     if date_from:
-        query = query.where(Measurement.date >= date_from)
+        query = query.where(DailyRollup.date >= date_from)
     if date_to:
-        query = query.where(Measurement.date <= date_to)
+        query = query.where(DailyRollup.date <= date_to)
 
     result = await session.execute(query)
     avg, min_val, max_val = result.one()
@@ -221,75 +419,238 @@ async def get_stats(
     return StatsOut(avg=avg, min=min_val, max=max_val)
 
 
+@router.get("/stats/distribution", response_model=DistributionOut)
+async def get_stats_distribution(
+    pollutant_id: int,
+    city_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    q: Optional[List[float]] = Query(None),
+    bins: int = Query(20, ge=1, le=200),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Percentiles and a histogram, from the daily quantile sketches merged
+    over the range (see sketch.py for the error bound).
+    """
+    quantiles = q or DEFAULT_QUANTILES
+    if any(not 0 <= quantile <= 1 for quantile in quantiles):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+    filters = [DailyRollup.pollutant_id == pollutant_id]
+    if city_id:
+        filters.append(DailyRollup.city_id == city_id)
+    if date_from:
+        filters.append(DailyRollup.date >= date_from)
+    if date_to:
+        filters.append(DailyRollup.date <= date_to)
+
+    # Merge the sketches in the database: one row per bucket
+    buckets = func.jsonb_each_text(DailyRollup.sketch).table_valued("key", "value")
+    merged = await session.execute(
+        select(buckets.c.key, func.sum(cast(buckets.c.value, Integer)))
+        .select_from(DailyRollup)
+        .join(buckets, true())
+        .where(*filters)
+        .group_by(buckets.c.key)
+    )
+    sketch = QuantileSketch(dict(merged.all()))
+
+    res = await session.execute(
+        select(func.min(DailyRollup.min), func.max(DailyRollup.max)).where(*filters)
+    )
+    min_val, max_val = res.one()
+
+    values = sketch.quantiles(quantiles)
+    histogram = []
+    if sketch.count:
+        counts = sketch.histogram(min_val, max_val, bins)
+        width = (max_val - min_val) / bins
+        histogram = [
+            HistogramBinOut(lo=min_val + i * width, hi=min_val + (i + 1) * width, count=n)
+            for i, n in enumerate(counts)
+        ]
+
+    return DistributionOut(
+        count=sketch.count,
+        min=min_val,
+        max=max_val,
+        relative_accuracy=RELATIVE_ACCURACY,
+        # The exact extremes are known, so estimates never leave [min, max]
+        percentiles=[
+            PercentileOut(q=quantile, value=None if value is None else min(max(value, min_val), max_val))
+            for quantile, value in zip(quantiles, values)
+        ],
+        histogram=histogram,
+    )
+
+
+@router.post("/stats/batch", response_model=StatsBatchOut)
+async def get_stats_batch(
+    body: StatsBatchRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    avg/min/max/count for every city x pollutant x date window, from one
+    GROUP BY city, pollutant over the daily rollups with a FILTER per window.
+    """
+    if not body.windows:
+        raise HTTPException(status_code=400, detail="At least one window is required")
+    if len(body.windows) > MAX_STATS_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STATS_WINDOWS} windows are allowed")
+
+    columns = []
+    in_any_window = []
+    for i, window in enumerate(body.windows):
+        bounds = []
+        if window.date_from:
+            bounds.append(DailyRollup.date >= window.date_from)
+        if window.date_to:
+            bounds.append(DailyRollup.date <= window.date_to)
+        condition = and_(*bounds) if bounds else true()
+        in_any_window.append(condition)
+        columns += rollup_aggregates(condition, suffix=f"_{i}")
+        columns.append(func.coalesce(func.sum(DailyRollup.count).filter(condition), 0).label(f"count_{i}"))
+
+    query = (
+        select(DailyRollup.city_id, DailyRollup.pollutant_id, *columns)
+        .where(or_(*in_any_window))
+        .group_by(DailyRollup.city_id, DailyRollup.pollutant_id)
+    )
+    if body.city_ids is not None:
+        query = query.where(DailyRollup.city_id.in_(body.city_ids))
+    if body.pollutant_ids is not None:
+        query = query.where(DailyRollup.pollutant_id.in_(body.pollutant_ids))
+
+    result = await session.execute(query)
+    found = {}
+    for row in result.all():
+        values = row[2:]
+        found[(row[0], row[1])] = [
+            WindowStatsOut(avg=avg, min=min_val, max=max_val, count=count)
+            for avg, min_val, max_val, count in zip(values[0::4], values[1::4], values[2::4], values[3::4])
+        ]
+
+    # Requested pairs without data still get a row, so the matrix is complete
+    if body.city_ids is not None and body.pollutant_ids is not None:
+        keys = [(c, p) for c in dict.fromkeys(body.city_ids) for p in dict.fromkeys(body.pollutant_ids)]
+    else:
+        keys = sorted(found)
+    empty = [WindowStatsOut(avg=None, min=None, max=None, count=0) for _ in body.windows]
+
+    return StatsBatchOut(
+        windows=body.windows,
+        series=[
+            StatsSeriesOut(city_id=city_id, pollutant_id=pollutant_id, windows=found.get((city_id, pollutant_id), empty))
+            for city_id, pollutant_id in keys
+        ],
+    )
+
+
 @router.get("/forecast/", response_model=List[MeasurementOut])
 async def forecast(
     city_id: int,
     date_from: date,
     date_to: date,
+    request: Request,
+    response: Response,
     session: AsyncSession = Depends(get_session),
 ):
-    result = await make_forecast(session, city_id, date_from, date_to)
+    unchanged = not_modified(request, response, city_id)
+    if unchanged:
+        return unchanged
+
+    result = await response_cache.get_or_compute(
+        ("forecast", city_id, date_from, date_to),
+        lambda: make_forecast(session, city_id, date_from, date_to),
+    )
     return result
 
     return await get_current_air_quality_status(session, city_id)
 
 @router.get("/cities/{city_id}/report")
-async def get_city_report(
-    city_id: int,
-    session: AsyncSession = Depends(get_session),
-):
-    # 1. Get City
-    city_res = await session.execute(select(City).where(City.id == city_id))
-    city = city_res.scalars().first()
-    if not city:
+async def get_city_report(city_id: int, request: Request, response: Response):
+    # Reports are dated, so a new day means a new representation
+    unchanged = not_modified(request, response, city_id, date.today())
+    if unchanged:
+        return unchanged
+
+    reports = await response_cache.get_or_compute(("report", city_id), lambda: build_reports([city_id]))
+    if not reports:
         raise HTTPException(status_code=404, detail="City not found")
+    return reports[0]
 
-    # 2. Get Status
-    status = await get_current_air_quality_status(session, city_id)
 
-    # 3. Get Stats for all pollutants (last 30 days for example)
-    # We want to show a summary of recent air quality
-    date_from = date.today() - timedelta(days=30)
-    
-    # Get all pollutants in this city
-    stmt_pollutants = (
-        select(Pollutant)
-        .join(Measurement, Measurement.pollutant_id == Pollutant.id)
-        .join(Station, Measurement.station_id == Station.id)
-        .where(Station.city_id == city_id)
-        .distinct()
-    )
-    pollutants_res = await session.execute(stmt_pollutants)
-    pollutants = pollutants_res.scalars().all()
-
-    stats_list = []
-    for p in pollutants:
-        # Calculate stats
-        query = (
-            select(
-                func.avg(Measurement.value).label("avg"),
-                func.min(Measurement.value).label("min"),
-                func.max(Measurement.value).label("max"),
-            )
-            .join(Station, Measurement.station_id == Station.id)
-            .where(Station.city_id == city_id)
-            .where(Measurement.pollutant_id == p.id)
-            .where(Measurement.date >= date_from)
-        )
-        res = await session.execute(query)
-        avg, min_val, max_val = res.one()
-        
-        if avg is not None:
-            stats_list.append({
-                "pollutant": p.code,
-                "avg": round(avg, 2),
-                "min": min_val,
-                "max": max_val
-            })
+@router.get("/reports/")
+async def get_city_reports(request: Request, response: Response,
+                           city_ids: Optional[List[int]] = Query(None)):
+    """Reports for several cities at once (all cities by default)."""
+    unchanged = not_modified(request, response, None, date.today())
+    if unchanged:
+        return unchanged
+
+    key = ("reports", tuple(sorted(set(city_ids))) if city_ids is not None else None)
+    return await response_cache.get_or_compute(key, lambda: build_reports(city_ids))
 
+
+@router.get("/status/")
+async def get_statuses(request: Request, response: Response):
+    """Air-quality status of every city in one response (map markers)."""
+    unchanged = not_modified(request, response)
+    if unchanged:
+        return unchanged
+
+    return await response_cache.get_or_compute(("status",), build_statuses)
+
+
+@router.get("/health")
+async def get_health():
+    """Liveness plus model readiness; the API serves while models are still warming."""
     return {
-        "city": city.name,
-        "date": date.today(),
-        "status": status,
-        "stats": stats_list
+        "status": "ok",
+        "models": model_registry.state,
+        "model_version": model_registry.active.version,
     }
+
+
+@router.get("/inference/stats")
+async def get_inference_stats():
+    """Queue depth, rejections, timeouts and queue-wait vs compute latency of model calls."""
+    return inference_service.stats()
+
+
+# ---- Model versions ----
+@router.get("/models/")
+async def get_model_versions():
+    """Published model versions, the active one and the one loaded in this process."""
+    return model_registry.describe()
+
+
+async def activate_model_version(version: str):
+    try:
+        await model_registry.switch_to(version, on_swap=models_swapped)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Model version not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model version failed to load: {e}")
+    return model_registry.describe()
+
+
+@router.post("/models/{version}/activate")
+async def activate_model(version: str, current_user: User = Depends(get_current_admin_user)):
+    """Makes a version active; other workers pick it up within MODEL_RELOAD_SECONDS."""
+    return await activate_model_version(version)
+
+
+@router.post("/models/rollback")
+async def rollback_model(current_user: User = Depends(get_current_admin_user)):
+    """Activates the version published before the active one."""
+    previous = model_registry.previous_version()
+    if previous is None:
+        raise HTTPException(status_code=409, detail="No earlier model version to roll back to")
+    return await activate_model_version(previous)
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss/eviction counters of the response cache."""
+    return response_cache.stats()
@@ -0,0 +1,159 @@
+"""
+Bulk loader for monthly measurement archives (.csv and .xlsx).
+
+Parses files in a process pool and writes them through a single database writer:
+
+    python -m app.bulk_load app/data
+    python -m app.bulk_load app/data/shchodenni-za-lipen-2024.csv --workers 4
+"""
+import argparse
+import asyncio
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.api import parse_month_year_from_filename, map_date_columns
+from app.db import DATABASE_URL
+from app.ingest import (
+    file_digest, iter_file_chunks, melt_measurements, refresh_changed, register_file, write_measurements
+)
+from app.models import IngestFile
+
+# Setup DB connection
+engine = create_async_engine(DATABASE_URL, echo=False)
+AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def parse_file(path: str):
+    """
+    Runs in a worker process: reads one file into a long measurement frame.
+    Returns (frame, rejected_cells, parse_seconds).
+    """
+    started = time.perf_counter()
+    file_year, file_month = parse_month_year_from_filename(os.path.basename(path))
+
+    frames = []
+    rejected = 0
+    with open(path, "rb") as fh:
+        for chunk in iter_file_chunks(fh):
+            date_columns = map_date_columns(chunk.columns, file_year, file_month)
+            frame = melt_measurements(chunk, date_columns)
+            rejected += frame.attrs.get("rejected_cells", 0)
+            frames.append(frame)
+
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return frame, rejected, time.perf_counter() - started
+
+
+def collect_files(paths, pattern: str):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for item in pattern.split(","):
+                files.extend(sorted(glob.glob(os.path.join(path, item.strip()))))
+        else:
+            files.append(path)
+    return files
+
+
+async def skip_ingested(files, force: bool):
+    """
+    Hashes the files and drops the ones already in the ingestion registry.
+    Returns [(path, content_hash)].
+    """
+    hashes = {}
+    for path in files:
+        with open(path, "rb") as fh:
+            hashes[path] = file_digest(fh)
+    if force:
+        return list(hashes.items())
+
+    async with AsyncSessionLocal() as session:
+        res = await session.execute(
+            select(IngestFile.content_hash).where(IngestFile.content_hash.in_(list(hashes.values())))
+        )
+        known = set(res.scalars().all())
+
+    pending = []
+    for path, content_hash in hashes.items():
+        if content_hash in known:
+            print(f"⏭️  {os.path.basename(path)}: already ingested")
+        else:
+            pending.append((path, content_hash))
+    return pending
+
+
+async def bulk_load(files, workers: int, force: bool = False):
+    loop = asyncio.get_running_loop()
+    summary = []
+    started = time.perf_counter()
+
+    pending = await skip_ingested(files, force)
+    files = [path for path, _ in pending]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Parse everything in parallel, but write in input order so that
+        # the last file wins when two files contain the same cell
+        futures = [loop.run_in_executor(pool, parse_file, path) for path in files]
+
+        async with AsyncSessionLocal() as session:
+            for (path, content_hash), future in zip(pending, futures):
+                name = os.path.basename(path)
+                try:
+                    frame, rejected, parse_seconds = await future
+                except Exception as e:
+                    print(f"❌ {name}: {e}")
+                    continue
+
+                write_started = time.perf_counter()
+                rows, changed = await write_measurements(session, frame)
+                file_year, file_month = parse_month_year_from_filename(name)
+                await register_file(session, content_hash, name, file_year, file_month, rows, changed)
+                await session.commit()
+                await refresh_changed(session)
+                write_seconds = time.perf_counter() - write_started
+
+                summary.append((name, rows, changed, rejected, parse_seconds, write_seconds))
+
+    total_seconds = time.perf_counter() - started
+    await engine.dispose()
+    return summary, total_seconds
+
+
+def print_summary(summary, total_seconds: float):
+    name_width = max([len(row[0]) for row in summary] + [4])
+    print(f"{'file':<{name_width}}  {'rows':>8}  {'changed':>8}  {'rejected':>8}  {'parse s':>8}  {'write s':>8}  {'rows/s':>10}")
+    for name, rows, changed, rejected, parse_seconds, write_seconds in summary:
+        rate = rows / (parse_seconds + write_seconds) if rows else 0
+        print(f"{name:<{name_width}}  {rows:>8}  {changed:>8}  {rejected:>8}  {parse_seconds:>8.2f}  {write_seconds:>8.2f}  {rate:>10.0f}")
+
+    total_rows = sum(row[1] for row in summary)
+    rate = total_rows / total_seconds if total_seconds else 0
+    print(f"✅ {len(summary)} files, {total_rows} rows in {total_seconds:.2f}s ({rate:.0f} rows/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load monthly measurement files")
+    parser.add_argument("paths", nargs="+", help="files or directories to load")
+    parser.add_argument("--pattern", default="*.csv,*.xlsx", help="comma-separated file patterns used for directories")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parser processes")
+    parser.add_argument("--force", action="store_true", help="re-apply files that were already ingested")
+    args = parser.parse_args()
+
+    files = collect_files(args.paths, args.pattern)
+    if not files:
+        print("No files to load.")
+        return
+
+    summary, total_seconds = asyncio.run(bulk_load(files, args.workers, args.force))
+    print_summary(summary, total_seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# backend/app/cache.py
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from fastapi import Request, Response
+
+# Entries kept before the least recently used one is evicted
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+
+# Seconds an entry stays valid even if no data version bump arrives
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+
+
+class DataVersions:
+    """
+    Counters that move whenever measurements or stations change.
+
+    version is global; a city's version is the global version of the last
+    change that touched it. Versions live in this process only and restart
+    with it, so ETags also carry a per-process epoch and roll over every TTL
+    window - writes from other workers or the bulk_load CLI are seen at most
+    CACHE_TTL_SECONDS late.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex
+        self.version = 0
+        self.cities = {}
+        self.floor = 0  # version of the last change that touched every city
+
+    def bump(self, city_ids: Optional[Iterable[int]] = None) -> int:
+        """
+        Moves the global version and the versions of city_ids;
+        every city when city_ids is None.
+        """
+        self.version += 1
+        if city_ids is None:
+            self.floor = self.version
+        else:
+            for city_id in city_ids:
+                self.cities[city_id] = self.version
+        return self.version
+
+    def city_version(self, city_id: int) -> int:
+        return max(self.cities.get(city_id, 0), self.floor)
+
+    def etag(self, request: Request, city_id: Optional[int] = None, *extra) -> str:
+        """
+        Strong ETag for a response to request: the global version, or the
+        city's version when the response only depends on one city.
+        """
+        version = self.version if city_id is None else self.city_version(city_id)
+        window = int(time.time() // CACHE_TTL_SECONDS)
+        key = "|".join(str(part) for part in (self.epoch, version, window, request.url.path, request.url.query, *extra))
+        return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+data_versions = DataVersions()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+def not_modified(request: Request, response: Response, city_id: Optional[int] = None, *extra) -> Optional[Response]:
+    """
+    Sets the ETag of response. Returns a 304 response when the client
+    already holds the current version, None when the body has to be built.
+    """
+    etag = data_versions.etag(request, city_id, *extra)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+
+class ResponseCache:
+    """
+    In-process LRU + TTL cache for read endpoints.
+
+    Every entry is tagged with the global data version it was computed at.
+    Writers bump data_versions after committing, which makes all older
+    entries stale. Writes made in other processes are picked up when the
+    TTL runs out.
+    """
+
+    def __init__(self, versions: DataVersions, max_entries: int = CACHE_MAX_ENTRIES,
+                 ttl: float = CACHE_TTL_SECONDS):
+        self.versions = versions
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (version, expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # LRU overflow
+        self.expirations = 0  # TTL ran out or the data version moved on
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        version, expires_at, value = entry
+        if version != self.versions.version or expires_at <= time.monotonic():
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.entries[key] = (self.versions.version, time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Cached value for key, or the result of compute() which is then stored.
+        Values are shared between requests and must not be mutated.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            version = self.versions.version
+            value = await compute()
+            # Don't store a result that may predate a write committed meanwhile
+            if version == self.versions.version:
+                self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "version": self.versions.version,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+response_cache = ResponseCache(data_versions)
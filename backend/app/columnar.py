@@ -0,0 +1,83 @@
+# backend/app/columnar.py
+import io
+from typing import Optional
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+ARROW_FILE = "application/vnd.apache.arrow.file"
+PARQUET = "application/vnd.apache.parquet"
+
+# Aliases some clients send
+_MEDIA_TYPES = {
+    ARROW_STREAM: ARROW_STREAM,
+    ARROW_FILE: ARROW_FILE,
+    PARQUET: PARQUET,
+    "application/x-parquet": PARQUET,
+}
+
+JSON = "application/json"
+
+
+def _accepted(accept: str):
+    """(media type, q) of every entry of an Accept header."""
+    for part in accept.split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        yield media_type.lower(), q
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """
+    Returns the columnar media type requested in an Accept header,
+    or None when the client wants JSON. The columnar type with the highest
+    q wins; types with q=0 are refused, and JSON wins when the client gives
+    it a higher q.
+    """
+    if not accept:
+        return None
+    best, best_q, json_q = None, 0.0, 0.0
+    for media_type, q in _accepted(accept):
+        if media_type in _MEDIA_TYPES and q > best_q:
+            best, best_q = _MEDIA_TYPES[media_type], q
+        elif media_type == JSON:
+            json_q = max(json_q, q)
+    if best is None or best_q < json_q:
+        return None
+    return best
+
+
+def encode_columns(columns: dict, media_type: str) -> bytes:
+    """
+    Builds an Arrow table straight from column lists and serializes it as an
+    Arrow IPC stream, Arrow IPC file or Parquet. Text columns are dictionary-encoded, since
+    city/station/pollutant names repeat on almost every row.
+    Raises ImportError when pyarrow is not installed.
+    """
+    import pyarrow as pa
+
+    arrays = {}
+    for name, values in columns.items():
+        array = pa.array(values)
+        if pa.types.is_string(array.type):
+            array = array.dictionary_encode()
+        arrays[name] = array
+    table = pa.table(arrays)
+
+    if media_type == PARQUET:
+        import pyarrow.parquet as pq
+
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer)
+        return buffer.getvalue()
+
+    sink = pa.BufferOutputStream()
+    new_writer = pa.ipc.new_file if media_type == ARROW_FILE else pa.ipc.new_stream
+    with new_writer(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,43 @@
+# backend/app/downsample.py
+
+
+def lttb_indices(x, y, threshold: int):
+    """
+    Largest-Triangle-Three-Buckets: picks `threshold` points of a series that
+    keep its visual shape. Returns the indices of the points to keep
+    (first and last are always kept).
+    """
+    import numpy as np
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold < 3 or n <= threshold:
+        return np.arange(n)
+
+    # Inner points split into threshold - 2 buckets: [edges[i], edges[i + 1])
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Third point of the triangle: average of the next bucket (or the last point)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
@@ -0,0 +1,139 @@
+# backend/app/forest.py
+"""
+Flat, memory-mappable format for the forecasting RandomForestRegressor.
+
+    forest/
+        feature.npy     int16   (nodes,)      feature tested by each node
+        threshold.npy   float64 (nodes,)      go left when x[feature] <= threshold
+        children.npy    int32   (nodes, 2)    left/right node; leaves point to themselves
+        value.npy       float64 (nodes,)      prediction of each leaf
+        roots.npy       int32   (trees,)      root node of each tree
+
+All trees share one node numbering. The arrays are opened with
+mmap_mode="r", so every worker maps the same page-cache copy instead of
+unpickling its own forest, and no pickle is involved at all.
+
+model_registry.publish exports a forecasting model into a version's forest/
+directory. Versions published before this format existed are converted by
+republishing the active one:
+
+    python -m app.forest
+"""
+import argparse
+import os
+
+import numpy as np
+
+ARRAYS = ("feature", "threshold", "children", "value", "roots")
+
+
+def export_forest(model, directory: str) -> dict:
+    """
+    Writes the trees of a fitted single-output RandomForestRegressor into
+    directory. Returns {file name: size in bytes}.
+    """
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output forests can be exported")
+
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    counts = np.array([tree.node_count for tree in trees])
+    roots = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    total = int(counts.sum())
+    if total >= np.iinfo(np.int32).max or model.n_features_in_ > np.iinfo(np.int16).max:
+        raise ValueError("Forest is too large for the flat format")
+
+    arrays = {
+        "feature": np.zeros(total, dtype=np.int16),
+        "threshold": np.zeros(total),
+        "children": np.empty((total, 2), dtype=np.int32),
+        "value": np.zeros(total),
+        "roots": roots.astype(np.int32),
+    }
+    for tree, offset in zip(trees, roots):
+        nodes = slice(offset, offset + tree.node_count)
+        own = np.arange(offset, offset + tree.node_count)
+        leaf = tree.children_left < 0
+        arrays["feature"][nodes] = np.where(leaf, 0, tree.feature)
+        arrays["threshold"][nodes] = tree.threshold
+        # A leaf is its own child, so walking past it stays on it
+        arrays["children"][nodes, 0] = np.where(leaf, own, tree.children_left + offset)
+        arrays["children"][nodes, 1] = np.where(leaf, own, tree.children_right + offset)
+        arrays["value"][nodes] = tree.value[:, 0, 0]
+
+    os.makedirs(directory, exist_ok=True)
+    sizes = {}
+    for name in ARRAYS:
+        filename = f"{name}.npy"
+        np.save(os.path.join(directory, filename), arrays[name])
+        sizes[filename] = os.path.getsize(os.path.join(directory, filename))
+    return sizes
+
+
+class FlatForest:
+    """
+    Predicts like the exported RandomForestRegressor, for every sample and
+    tree at once: each step moves all (sample, tree) pairs one level down,
+    until every pair has reached a leaf.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str = "r") -> "FlatForest":
+        return cls(**{
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in ARRAYS
+        })
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    def predict(self, X) -> np.ndarray:
+        # The trees were fit on float32 inputs, like sklearn compares them
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(np.asarray(self.roots), (len(X), len(self.roots)))
+        while True:
+            go_right = X[rows, self.feature[nodes]] > self.threshold[nodes]
+            step = self.children[nodes, go_right.astype(np.intp)]
+            if np.array_equal(step, nodes):
+                break
+            nodes = step
+        return self.value[nodes].mean(axis=1)
+
+
+def main():
+    # Import the class the registry uses, not the one of this __main__ module
+    from .forest import FlatForest
+    from .model_registry import model_registry, LEGACY_VERSION
+
+    parser = argparse.ArgumentParser(description="Republish the active model version with its forest as flat arrays")
+    parser.add_argument("--no-activate", action="store_true", help="publish without making it active")
+    args = parser.parse_args()
+
+    # publish carries the other artifacts over from the active version
+    version = model_registry.active_version() or LEGACY_VERSION
+    bundle = model_registry.load_version(version)
+    if isinstance(bundle.model, FlatForest):
+        print(f"Version {version} already has a flat forest.")
+        return
+    if not hasattr(bundle.model, "estimators_"):
+        print(f"Version {version} has no forest model to export.")
+        return
+
+    new_version = model_registry.publish(
+        {"model": bundle.model},
+        {"exported_from": version},
+        activate=not args.no_activate,
+    )
+    print(f"✅ Version {version} republished with a flat forest as {new_version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# backend/app/inference.py
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+# Threads running model calls; sklearn/numpy release the GIL for most of the work
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+
+# Calls waiting or running before new ones are rejected with 503
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "16"))
+
+# Default time a request waits for its model call (queue wait included)
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "30"))
+
+# Recent calls kept for the latency percentiles
+METRICS_WINDOW = 500
+
+
+class InferenceBusy(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=503, detail="Inference is saturated, retry later",
+                         headers={"Retry-After": "1"})
+
+
+class InferenceTimeout(HTTPException):
+    def __init__(self, timeout: float):
+        super().__init__(status_code=504, detail=f"Inference did not finish within {timeout:g}s")
+
+
+class InferenceService:
+    """
+    Runs model calls in a bounded thread pool so they never block the event loop.
+
+    At most max_pending calls are waiting or running; further calls fail fast
+    with InferenceBusy (503). A call that exceeds its timeout fails with
+    InferenceTimeout (504); a call still queued is cancelled, a running one
+    finishes in the background and keeps its pending slot until then, so
+    timeouts cannot pile up extra work.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, max_pending: int = INFERENCE_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._wait_seconds = deque(maxlen=METRICS_WINDOW)
+        self._compute_seconds = deque(maxlen=METRICS_WINDOW)
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """
+        Runs fn(*args) in the pool and returns its result.
+        """
+        if self._executor is None:
+            raise RuntimeError("Inference service is not running")
+        timeout = INFERENCE_TIMEOUT_SECONDS if timeout is None else timeout
+
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise InferenceBusy()
+            self.pending += 1
+
+        submitted = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self._wait_seconds.append(started - submitted)
+                    self._compute_seconds.append(finished - started)
+
+        def release(_future):
+            with self._lock:
+                self.pending -= 1
+
+        try:
+            future = self._executor.submit(call)
+        except RuntimeError:
+            with self._lock:
+                self.pending -= 1
+            raise
+        # Also runs when a timeout cancels the call before it started
+        future.add_done_callback(release)
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise InferenceTimeout(timeout)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        import numpy as np
+
+        with self._lock:
+            wait = np.array(self._wait_seconds)
+            compute = np.array(self._compute_seconds)
+            counters = {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+        def summary(values) -> dict:
+            if not len(values):
+                return {"avg": None, "p50": None, "p95": None, "max": None}
+            return {
+                "avg": float(values.mean()),
+                "p50": float(np.percentile(values, 50)),
+                "p95": float(np.percentile(values, 95)),
+                "max": float(values.max()),
+            }
+
+        # Over the last METRICS_WINDOW calls, in seconds
+        return {**counters, "queue_wait": summary(wait), "compute": summary(compute)}
+
+
+inference_service = InferenceService()
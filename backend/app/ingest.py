@@ -0,0 +1,525 @@
+# backend/app/ingest.py
+from __future__ import annotations
+
+import codecs
+import hashlib
+from datetime import date, datetime
+from typing import TYPE_CHECKING
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models import City, Station, Pollutant, IngestFile
+from .sketch import bucket_sql
+
+# pandas takes longer to import than the rest of the API together;
+# it is imported by the functions that parse uploads
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columns that describe a row and never contain a measurement
+META_COLUMNS = ["city", "coordinateNumber", "nameImpurity", "yearMonth"]
+
+# Cell values that mean "no measurement"
+EMPTY_VALUES = ["", "-", "nan", "null", "None"]
+
+# Rows sent per COPY batch
+BATCH_SIZE = 10000
+
+STAGING_TABLE = "incoming_measurements"
+# Rows the last merge actually inserted or updated
+CHANGED_TABLE = "changed_measurements"
+# (city, pollutant, day) keys whose rollups and latest values are refreshed
+TOUCHED_TABLE = "touched_days"
+# Keys still to refresh, committed with the measurements (models.PendingRefresh)
+PENDING_TABLE = "pending_refreshes"
+
+# pg_advisory_xact_lock key serializing refresh_changed transactions
+REFRESH_LOCK_ID = 0x6D6F6E69
+
+# Priority: UTF-8 -> CP1251, Semicolon -> Comma
+ENCODINGS = ["utf-8", "cp1251"]
+SEPARATORS = [";", ","]
+
+# How much of an upload is read to detect its format
+SNIFF_BYTES = 64 * 1024
+
+# Rows parsed per chunk when streaming a file into the database
+CHUNK_ROWS = 2000
+
+
+def sniff_csv_format(sample: bytes):
+    """
+    Detects (encoding, separator) from the first bytes of a CSV file.
+    Returns None when the sample doesn't look like a supported CSV.
+    """
+    for encoding in ENCODINGS:
+        try:
+            # Incremental decoder tolerates a multi-byte character cut at the end of the sample
+            decoded = codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        except UnicodeDecodeError:
+            continue
+
+        header = decoded.lstrip("\ufeff").splitlines()[0] if decoded.strip() else ""
+        for sep in SEPARATORS:
+            # Heuristic: valid file should have multiple columns
+            if sep in header:
+                return encoding, sep
+    return None
+
+
+def iter_csv_chunks(fileobj, chunksize: int = CHUNK_ROWS):
+    """
+    Yields DataFrame chunks of a CSV file object without loading it whole.
+    All cells are read as text so every chunk is parsed the same way.
+    Raises ValueError when the format can't be detected.
+    """
+    import pandas as pd
+
+    sample = fileobj.read(SNIFF_BYTES)
+    fileobj.seek(0)
+    fmt = sniff_csv_format(sample)
+    if fmt is None:
+        raise ValueError("Unsupported CSV format")
+
+    encoding, sep = fmt
+    with pd.read_csv(fileobj, sep=sep, encoding=encoding, dtype=str, chunksize=chunksize) as reader:
+        yield from reader
+
+
+def is_xlsx(sample: bytes) -> bool:
+    # .xlsx files are zip archives
+    return sample[:4] == b"PK\x03\x04"
+
+
+def _header_name(value, position: int):
+    if value is None or value == "":
+        return f"Unnamed: {position}"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime, date)):
+        return value
+    return str(value)
+
+
+def iter_xlsx_chunks(fileobj, chunksize: int = CHUNK_ROWS):
+    """
+    Yields DataFrame chunks of every worksheet in an .xlsx file.
+    The workbook is opened in read-only mode and rows are streamed one by one,
+    so the sheet is never built as a whole in memory.
+
+    A zip archive is not read front to back, so the file position says
+    nothing about progress; every chunk has the share of worksheet rows read
+    so far in frame.attrs["progress"] instead.
+    """
+    import pandas as pd
+
+    # openpyxl is only needed for spreadsheets
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    # Row counts come from the sheets' dimensions and may be missing
+    total_rows = sum(sheet.max_row or 0 for sheet in workbook.worksheets)
+    rows_read = 0
+
+    def chunk(batch, columns):
+        frame = pd.DataFrame(batch, columns=columns, dtype=object)
+        frame.attrs["progress"] = min(rows_read / total_rows, 1.0) if total_rows else 0.0
+        return frame
+
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            rows_read += 1
+            if not header:
+                continue
+            columns = [_header_name(value, i) for i, value in enumerate(header)]
+            width = len(columns)
+
+            batch = []
+            for row in rows:
+                rows_read += 1
+                if all(value is None for value in row):
+                    continue
+                # Read-only rows may be shorter or longer than the header
+                row = tuple(row[:width]) + (None,) * (width - len(row))
+                batch.append(row)
+                if len(batch) >= chunksize:
+                    yield chunk(batch, columns)
+                    batch = []
+            if batch:
+                yield chunk(batch, columns)
+    finally:
+        workbook.close()
+
+
+def iter_file_chunks(fileobj, chunksize: int = CHUNK_ROWS):
+    """
+    Yields DataFrame chunks of a CSV or .xlsx file object, picked by its content.
+    """
+    sample = fileobj.read(4)
+    fileobj.seek(0)
+    if is_xlsx(sample):
+        return iter_xlsx_chunks(fileobj, chunksize)
+    return iter_csv_chunks(fileobj, chunksize)
+
+
+def _clean_text(series: pd.Series) -> pd.Series:
+    return series.astype(str).str.strip()
+
+
+def melt_measurements(df: pd.DataFrame, date_columns: dict) -> pd.DataFrame:
+    """
+    Reshapes a wide monthly sheet (one column per day) into long format in one pass.
+
+    date_columns maps a column header to its parsed date; headers that are not
+    dates should be left out. Returns a frame with the columns
+    city, station, pollutant, date, value - one row per valid cell.
+    The number of non-numeric cells is kept in frame.attrs["rejected_cells"].
+    """
+    import pandas as pd
+
+    columns = ["city", "station", "pollutant", "date", "value"]
+    date_columns = {col: d for col, d in date_columns.items() if d and col in df.columns}
+    if df.empty or not date_columns:
+        return pd.DataFrame(columns=columns)
+
+    wide = pd.DataFrame({
+        "city": _clean_text(df["city"]) if "city" in df.columns else "",
+        "station": _clean_text(df["coordinateNumber"]) if "coordinateNumber" in df.columns else "",
+        "pollutant": _clean_text(df["nameImpurity"]) if "nameImpurity" in df.columns else "",
+    }, index=df.index)
+
+    # Skip rows without city, station or pollutant
+    valid = pd.Series(True, index=df.index)
+    for key in ["city", "station", "pollutant"]:
+        valid &= ~wide[key].isin(["", "nan"])
+    wide = wide[valid]
+
+    cells = df.loc[valid, list(date_columns)].astype(str)
+    wide = pd.concat([wide, cells], axis=1)
+
+    long = wide.melt(
+        id_vars=["city", "station", "pollutant"],
+        value_vars=list(date_columns),
+        var_name="header",
+        value_name="raw",
+    )
+
+    # Clean values: "0,07" -> 0.07, "<0,01" -> 0.01, "-"/"null" -> dropped
+    raw = long["raw"].str.replace(",", ".", regex=False).str.strip()
+    raw = raw.mask(raw.isin(EMPTY_VALUES))
+    raw = raw.str.replace("<", "", regex=False).str.replace(">", "", regex=False)
+    value = pd.to_numeric(raw, errors="coerce")
+    # "inf" and "nan" parse as numbers, but are not measurements
+    long["value"] = value.mask(value.abs() == float("inf"))
+    # Cells that had something in them but not a finite number
+    rejected = int((raw.notna() & long["value"].isna()).sum())
+    long = long.dropna(subset=["value"])
+
+    long["date"] = long["header"].map(date_columns)
+    result = long[columns].reset_index(drop=True)
+    result.attrs["rejected_cells"] = rejected
+    return result
+
+
+async def resolve_ids(session: AsyncSession, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds station_id and pollutant_id columns to a long frame,
+    creating missing cities, stations and pollutants in bulk.
+    """
+    import pandas as pd
+
+    frame = frame.copy()
+    if frame.empty:
+        frame["station_id"] = pd.Series(dtype="int64")
+        frame["pollutant_id"] = pd.Series(dtype="int64")
+        return frame
+
+    # 1. Cities (unique by name)
+    city_names = frame["city"].unique().tolist()
+    await session.execute(
+        pg_insert(City)
+        .values([{"name": name} for name in city_names])
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    res = await session.execute(select(City.name, City.id).where(City.name.in_(city_names)))
+    city_ids = dict(res.all())
+    frame["city_id"] = frame["city"].map(city_ids)
+
+    # 2. Pollutants (unique by code)
+    codes = frame["pollutant"].unique().tolist()
+    await session.execute(
+        pg_insert(Pollutant)
+        .values([{"code": code, "description": code} for code in codes])
+        .on_conflict_do_nothing(index_elements=["code"])
+    )
+    res = await session.execute(select(Pollutant.code, Pollutant.id).where(Pollutant.code.in_(codes)))
+    pollutant_ids = dict(res.all())
+    frame["pollutant_id"] = frame["pollutant"].map(pollutant_ids)
+
+    # 3. Stations (unique by name within a city)
+    stations_query = (
+        select(Station.city_id, Station.name, Station.id)
+        .where(Station.city_id.in_(list(city_ids.values())))
+    )
+    res = await session.execute(stations_query)
+    station_ids = {(city_id, name): station_id for city_id, name, station_id in res.all()}
+
+    pairs = frame[["city_id", "station"]].drop_duplicates()
+    missing = [
+        {"city_id": int(city_id), "name": name}
+        for city_id, name in pairs.itertuples(index=False)
+        if (city_id, name) not in station_ids
+    ]
+    if missing:
+        # A parallel job may create the same stations; read back whichever row won
+        await session.execute(
+            pg_insert(Station)
+            .values(missing)
+            .on_conflict_do_nothing(index_elements=["city_id", "name"])
+        )
+        res = await session.execute(stations_query)
+        station_ids = {(city_id, name): station_id for city_id, name, station_id in res.all()}
+
+    keys = pd.MultiIndex.from_frame(frame[["city_id", "station"]])
+    frame["station_id"] = [station_ids[key] for key in keys]
+    return frame
+
+
+# Per-connection staging tables for COPY; emptied at the end of every transaction
+_CREATE_STAGING = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+        station_id integer,
+        pollutant_id integer,
+        date date,
+        value double precision
+    ) ON COMMIT DELETE ROWS;
+    CREATE TEMP TABLE IF NOT EXISTS {CHANGED_TABLE} (
+        station_id integer,
+        pollutant_id integer,
+        date date,
+        value double precision
+    ) ON COMMIT DELETE ROWS;
+    CREATE TEMP TABLE IF NOT EXISTS {TOUCHED_TABLE} (
+        city_id integer,
+        pollutant_id integer,
+        date date
+    ) ON COMMIT DELETE ROWS;
+"""
+
+_MERGE_STAGING = f"""
+    WITH changed AS (
+        INSERT INTO measurements (station_id, pollutant_id, date, value)
+        SELECT station_id, pollutant_id, date, value FROM {STAGING_TABLE}
+        ON CONFLICT (station_id, pollutant_id, date) DO UPDATE SET value = EXCLUDED.value
+        WHERE measurements.value IS DISTINCT FROM EXCLUDED.value
+        RETURNING station_id, pollutant_id, date, value
+    )
+    INSERT INTO {CHANGED_TABLE} SELECT station_id, pollutant_id, date, value FROM changed
+"""
+
+_QUEUE_CHANGED = f"""
+    INSERT INTO {PENDING_TABLE} (city_id, pollutant_id, date)
+    SELECT DISTINCT s.city_id, c.pollutant_id, c.date
+    FROM {CHANGED_TABLE} c JOIN stations s ON s.id = c.station_id
+    WHERE c.date IS NOT NULL
+"""
+
+# Takes every committed pending key; uploads still in progress keep theirs
+_DRAIN_PENDING = f"""
+    WITH drained AS (
+        DELETE FROM {PENDING_TABLE} RETURNING city_id, pollutant_id, date
+    )
+    INSERT INTO {TOUCHED_TABLE} SELECT DISTINCT city_id, pollutant_id, date FROM drained
+"""
+
+# Recomputes the daily rollups of the touched days, including their quantile
+# sketches (see sketch.py). A whole (city, pollutant, day) is re-aggregated
+# from the committed measurements, so updated values keep min/max and the
+# sketch exact. Rows are written in key order.
+_REFRESH_ROLLUPS = f"""
+    WITH day_values AS (
+        SELECT s.city_id, m.pollutant_id, m.date, m.value
+        FROM {TOUCHED_TABLE} k
+        JOIN stations s ON s.city_id = k.city_id
+        JOIN measurements m ON m.station_id = s.id AND m.pollutant_id = k.pollutant_id AND m.date = k.date
+        -- Infinity/NaN have no sketch bucket and would poison sum/min/max
+        WHERE m.value > '-Infinity' AND m.value < 'Infinity'
+    ), buckets AS (
+        SELECT city_id, pollutant_id, date, {bucket_sql("value")} AS bucket, count(*) AS n
+        FROM day_values
+        GROUP BY 1, 2, 3, 4
+    )
+    INSERT INTO daily_rollups (city_id, pollutant_id, date, sum, count, min, max, sketch)
+    SELECT a.city_id, a.pollutant_id, a.date, a.sum, a.count, a.min, a.max, b.sketch
+    FROM (
+        SELECT city_id, pollutant_id, date,
+               sum(value) AS sum, count(value) AS count, min(value) AS min, max(value) AS max
+        FROM day_values
+        GROUP BY 1, 2, 3
+    ) a
+    JOIN (
+        SELECT city_id, pollutant_id, date, jsonb_object_agg(bucket, n) AS sketch
+        FROM buckets
+        GROUP BY 1, 2, 3
+    ) b USING (city_id, pollutant_id, date)
+    ORDER BY a.city_id, a.pollutant_id, a.date
+    ON CONFLICT (city_id, pollutant_id, date) DO UPDATE SET
+        sum = EXCLUDED.sum, count = EXCLUDED.count, min = EXCLUDED.min, max = EXCLUDED.max,
+        sketch = EXCLUDED.sketch
+"""
+
+# Recomputes the latest value of every touched (city, pollutant) from the
+# committed measurements since its earliest touched day; the latest one is
+# never older than that. On a date tie the highest station id wins, as in
+# the backfill migration.
+_REFRESH_LATEST = f"""
+    WITH pairs AS (
+        SELECT city_id, pollutant_id, min(date) AS date_from
+        FROM {TOUCHED_TABLE}
+        GROUP BY 1, 2
+    )
+    INSERT INTO latest_measurements (city_id, pollutant_id, station_id, date, value)
+    SELECT DISTINCT ON (p.city_id, p.pollutant_id)
+           p.city_id, p.pollutant_id, m.station_id, m.date, m.value
+    FROM pairs p
+    JOIN stations s ON s.city_id = p.city_id
+    JOIN measurements m ON m.station_id = s.id AND m.pollutant_id = p.pollutant_id AND m.date >= p.date_from
+    ORDER BY p.city_id, p.pollutant_id, m.date DESC, m.station_id DESC
+    ON CONFLICT (city_id, pollutant_id) DO UPDATE SET
+        station_id = EXCLUDED.station_id, date = EXCLUDED.date, value = EXCLUDED.value
+"""
+
+async def refresh_changed(session: AsyncSession) -> set:
+    """
+    Refreshes the daily rollups and latest values of every pending key (see
+    models.PendingRefresh), in a short transaction of its own. Call it after
+    committing the measurements: the long ingest transactions then never
+    hold locks on the shared rollup rows, and parallel uploads don't wait
+    for each other.
+
+    The keys are deleted in the same transaction, so a refresh that fails
+    leaves them pending for the next call - after any later commit, or at
+    startup. Refreshes are serialized with an advisory lock, so each one
+    recomputes from measurements committed before it started and none can
+    overwrite a newer result with an older one.
+
+    Returns the ids of the refreshed cities, to bump the data versions
+    (see cache.py).
+    """
+    # Through the session, so that it also begins the transaction
+    pending = await session.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {PENDING_TABLE})"))
+    if not pending:
+        await session.commit()
+        return set()
+
+    await session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": REFRESH_LOCK_ID})
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    pg = raw.driver_connection  # asyncpg connection
+    await pg.execute(_CREATE_STAGING)
+    await pg.execute(_DRAIN_PENDING)
+    city_ids = {row["city_id"] for row in await pg.fetch(f"SELECT DISTINCT city_id FROM {TOUCHED_TABLE}")}
+    await pg.execute(_REFRESH_ROLLUPS)
+    await pg.execute(_REFRESH_LATEST)
+    await session.commit()
+    return city_ids
+
+
+async def upsert_records(session: AsyncSession, records: list, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Writes (station_id, pollutant_id, date, value) tuples. Every batch is one
+    COPY into a staging table plus one INSERT ... SELECT ... ON CONFLICT DO UPDATE,
+    run on the session's connection so it joins the current transaction.
+    Rows whose value didn't change are left alone; the keys of the changed
+    ones are queued in the same transaction for refresh_changed, which the
+    caller runs after commit.
+    Returns the number of inserted or updated rows.
+    """
+    # ON CONFLICT cannot touch the same row twice in one statement - last value wins
+    records = list({record[:3]: record for record in records}.values())
+    if not records:
+        return 0
+
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    pg = raw.driver_connection  # asyncpg connection
+    await pg.execute(_CREATE_STAGING)
+
+    changed = 0
+    for start in range(0, len(records), batch_size):
+        await pg.execute(f"TRUNCATE {STAGING_TABLE}, {CHANGED_TABLE}")
+        await pg.copy_records_to_table(
+            STAGING_TABLE,
+            records=records[start:start + batch_size],
+            columns=["station_id", "pollutant_id", "date", "value"],
+        )
+        status = await pg.execute(_MERGE_STAGING)  # "INSERT 0 <rows>"
+        batch_changed = int(status.split()[-1])
+        if batch_changed:
+            await pg.execute(_QUEUE_CHANGED)
+        changed += batch_changed
+    return changed
+
+
+async def upsert_measurements(session: AsyncSession, frame: pd.DataFrame) -> int:
+    """
+    Writes a frame with station_id, pollutant_id, date and value columns.
+    """
+    records = list(zip(
+        frame["station_id"].astype(int).tolist(),
+        frame["pollutant_id"].astype(int).tolist(),
+        frame["date"].tolist(),
+        frame["value"].astype(float).tolist(),
+    ))
+    return await upsert_records(session, records)
+
+
+async def write_measurements(session: AsyncSession, frame: pd.DataFrame):
+    """
+    Resolves ids for a long frame (see melt_measurements) and upserts it.
+    Returns (processed cells, changed rows). The caller commits and then
+    runs refresh_changed.
+    """
+    if frame.empty:
+        return 0, 0
+    frame = await resolve_ids(session, frame)
+    changed = await upsert_measurements(session, frame)
+    return len(frame), changed
+
+
+def file_digest(fileobj, block_size: int = 1024 * 1024) -> str:
+    """
+    sha256 of a file object, read block by block from the start.
+    """
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(block_size), b""):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+async def find_ingested_file(session: AsyncSession, content_hash: str):
+    res = await session.execute(select(IngestFile).where(IngestFile.content_hash == content_hash))
+    return res.scalars().first()
+
+
+async def register_file(session: AsyncSession, content_hash: str, filename: str,
+                        year: int, month: int, rows_processed: int, rows_changed: int) -> None:
+    """
+    Records an ingested file in the registry. The caller commits.
+    """
+    await session.execute(
+        pg_insert(IngestFile)
+        .values(
+            content_hash=content_hash,
+            filename=filename,
+            year=year,
+            month=month,
+            rows_processed=rows_processed,
+            rows_changed=rows_changed,
+        )
+        .on_conflict_do_nothing(index_elements=["content_hash"])
+    )
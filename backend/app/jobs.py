@@ -0,0 +1,129 @@
+# backend/app/jobs.py
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+# Number of files ingested in parallel
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+# Finished jobs kept for the progress endpoint
+MAX_FINISHED_JOBS = 200
+
+
+@dataclass
+class IngestJob:
+    filename: str
+    path: str
+    total_bytes: int
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    content_hash: Optional[str] = None
+    status: str = "queued"  # queued | running | done | skipped | failed
+    bytes_read: int = 0
+    rows_written: int = 0
+    rows_changed: int = 0
+    rejected_cells: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def progress(self) -> float:
+        if self.status in ("done", "skipped"):
+            return 1.0
+        if not self.total_bytes:
+            return 0.0
+        return min(self.bytes_read / self.total_bytes, 1.0)
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+
+JobHandler = Callable[[IngestJob], Awaitable[None]]
+
+
+class IngestQueue:
+    """
+    In-process job queue drained by a pool of asyncio workers.
+    Handlers are expected to push CPU work (parsing) to threads,
+    so the event loop keeps serving requests while files ingest.
+
+    Jobs live in this process only: run the API as a single worker, or a
+    progress request that lands on another worker gets a 404. Jobs still
+    queued at shutdown are dropped along with their uploads; a file can simply
+    be uploaded again, since its rows are merged rather than duplicated.
+    """
+
+    def __init__(self, workers: int = INGEST_WORKERS):
+        self.workers = workers
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Nothing will pick the queued jobs up again
+        while self._queue is not None and not self._queue.empty():
+            job, _ = self._queue.get_nowait()
+            job.status = "failed"
+            job.error = "Server shut down before the job started"
+            job.finished_at = time.time()
+            if os.path.exists(job.path):
+                os.remove(job.path)
+
+    def submit(self, job: IngestJob, handler: JobHandler) -> IngestJob:
+        if self._queue is None:
+            raise RuntimeError("Ingest queue is not running")
+        self.jobs[job.id] = job
+        self._queue.put_nowait((job, handler))
+        self._forget_finished()
+        return job
+
+    def record(self, job: IngestJob) -> IngestJob:
+        """Keeps a job that finished without being queued (e.g. a skipped duplicate)."""
+        self.jobs[job.id] = job
+        self._forget_finished()
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job, handler = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                await handler(job)
+                if job.status == "running":
+                    job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e) or e.__class__.__name__
+            finally:
+                job.finished_at = time.time()
+                if os.path.exists(job.path):
+                    os.remove(job.path)
+                self._queue.task_done()
+
+
+ingest_queue = IngestQueue()
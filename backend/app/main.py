@@ -1,9 +1,41 @@
 # backend/app/main.py
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from .api import router as api_router
 from .api_endpoints import router as api_endpoints_router
+from .ai import models_swapped
+from .inference import inference_service
+from .model_registry import model_registry
+from .jobs import ingest_queue
+from .db import SessionLocal
+from .ingest import refresh_changed
 
-app = FastAPI(title="Monitoring API")
+logger = logging.getLogger(__name__)
+
+
+async def refresh_pending():
+    """Finishes the refreshes that failed or were cut off before the last shutdown."""
+    try:
+        async with SessionLocal() as session:
+            await refresh_changed(session)
+    except Exception:
+        logger.exception("Refreshing pending rollups failed; the next upload retries it")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await refresh_pending()
+    await ingest_queue.start()
+    inference_service.start()
+    model_registry.start(on_swap=models_swapped)
+    yield
+    await model_registry.stop()
+    inference_service.stop()
+    await ingest_queue.stop()
+
+
+app = FastAPI(title="Monitoring API", lifespan=lifespan)
 
 app.include_router(api_router, prefix="/api")
 app.include_router(api_endpoints_router, prefix="/api")
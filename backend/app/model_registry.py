@@ -0,0 +1,335 @@
+# backend/app/model_registry.py
+"""
+Versioned store for the trained models.
+
+    model_registry/             <- backend/model_registry, or MODEL_REGISTRY_DIR
+        20261016T120000123456-1a2b3c/
+            forest/             <- forecasting forest as flat arrays, memory-mapped (see forest.py)
+            model.pkl           <- older versions and models that are not forests
+            label_encoder.pkl
+            quality_models.pkl
+            metadata.json
+        ACTIVE                  <- name of the version the API serves
+
+A version is written into a hidden temp directory and renamed into place once
+complete, and ACTIVE is replaced with os.replace, so readers never see a
+half-written version. Running processes notice a new ACTIVE, load that
+version in the background and swap it in as one object.
+
+Nothing is unpickled at import time: the API warms the registry in a
+lifespan task, and scripts load it on first use.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Outside the app package, so publishing never writes into the source tree
+# that uvicorn --reload watches
+MODEL_REGISTRY_DIR = os.getenv(
+    "MODEL_REGISTRY_DIR", os.path.join(os.path.dirname(BASE_DIR), "model_registry")
+)
+
+# How often running processes check ACTIVE for a new version
+MODEL_RELOAD_SECONDS = float(os.getenv("MODEL_RELOAD_SECONDS", "30"))
+
+ACTIVE_FILE = "ACTIVE"
+METADATA_FILE = "metadata.json"
+
+# Artifact name -> file name
+ARTIFACTS = {
+    "model": "model.pkl",
+    "label_encoder": "label_encoder.pkl",
+    "quality_models": "quality_models.pkl",
+}
+
+# Directory of the memory-mapped forecasting model inside a version. Forests
+# are published in this format only, without a model.pkl
+FOREST_DIR = "forest"
+
+# Version name for the flat .pkl files next to this module (before the registry existed)
+LEGACY_VERSION = "legacy"
+
+
+@dataclass
+class ModelBundle:
+    version: Optional[str] = None
+    model: Any = None
+    label_encoder: Any = None
+    quality_models: Any = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+def _sha256(f) -> str:
+    digest = hashlib.sha256()
+    for block in iter(lambda: f.read(1024 * 1024), b""):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    def __init__(self, root: str = MODEL_REGISTRY_DIR):
+        self.root = root
+        self.active = ModelBundle()
+        self.state = "cold"  # cold | warming | ready | failed
+        self.load_error: Optional[str] = None
+        self._failed_version: Optional[str] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    # ---- Versions on disk ----
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith(".") and os.path.isfile(os.path.join(self.root, name, METADATA_FILE))
+        )
+
+    def metadata(self, version: str) -> dict:
+        with open(os.path.join(self.root, version, METADATA_FILE)) as f:
+            return json.load(f)
+
+    def active_version(self) -> Optional[str]:
+        """Version named by ACTIVE; the newest one when ACTIVE is missing."""
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                version = f.read().strip()
+            if version:
+                return version
+        except FileNotFoundError:
+            pass
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def activate(self, version: str):
+        if version not in self.versions():
+            raise KeyError(version)
+        _write_atomic(os.path.join(self.root, ACTIVE_FILE), version.encode())
+
+    def previous_version(self) -> Optional[str]:
+        """The version published before the active one, for rollbacks."""
+        versions = self.versions()
+        active = self.active_version()
+        if active not in versions:
+            return None
+        index = versions.index(active)
+        return versions[index - 1] if index > 0 else None
+
+    def publish(self, artifacts: Dict[str, Any], metadata: dict, activate: bool = True,
+                inherit: bool = True) -> str:
+        """
+        Stores a new version and (by default) makes it active. Artifacts not
+        given are carried over from the active version when inherit is set,
+        e.g. retraining the forecaster keeps the current quality models.
+        A forest model is stored as flat arrays (see forest.py), not pickled.
+        """
+        # Names sort in publish order; microseconds keep versions published
+        # within one second apart (and still sort after older, second-only names)
+        version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f") + "-" + uuid.uuid4().hex[:6]
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f".tmp-{version}")
+        os.makedirs(tmp_dir)
+
+        base, base_dir, inherited = None, None, {}
+        if inherit:
+            base = self.active_version() or LEGACY_VERSION
+            base_dir = BASE_DIR if base == LEGACY_VERSION else os.path.join(self.root, base)
+            if base != LEGACY_VERSION:
+                inherited = {
+                    key: value for key, value in self.metadata(base).items()
+                    if key not in ("version", "created_at", "parent", "files")
+                }
+
+        files = {}
+        artifacts = dict(artifacts)
+        forest_dir = os.path.join(tmp_dir, FOREST_DIR)
+        if "model" in artifacts and hasattr(artifacts["model"], "estimators_"):
+            from .forest import export_forest
+            export_forest(artifacts.pop("model"), forest_dir)
+        elif "model" not in artifacts and base_dir and os.path.isdir(os.path.join(base_dir, FOREST_DIR)):
+            shutil.copytree(os.path.join(base_dir, FOREST_DIR), forest_dir)
+        if os.path.isdir(forest_dir):
+            for filename in sorted(os.listdir(forest_dir)):
+                with open(os.path.join(forest_dir, filename), "rb") as f:
+                    files[f"{FOREST_DIR}/{filename}"] = _sha256(f)
+
+        for name, filename in ARTIFACTS.items():
+            target = os.path.join(tmp_dir, filename)
+            if name in artifacts:
+                with open(target, "wb") as f:
+                    pickle.dump(artifacts[name], f)
+            elif name == "model" and os.path.isdir(forest_dir):
+                continue
+            elif base_dir and os.path.exists(os.path.join(base_dir, filename)):
+                shutil.copyfile(os.path.join(base_dir, filename), target)
+            else:
+                continue
+            with open(target, "rb") as f:
+                files[filename] = _sha256(f)
+
+        # Metadata of carried-over artifacts stays with them
+        metadata = {
+            **inherited,
+            **metadata,
+            "version": version,
+            "created_at": datetime.utcnow().isoformat(),
+            "parent": base,
+            "files": files,
+        }
+        with open(os.path.join(tmp_dir, METADATA_FILE), "w") as f:
+            json.dump(metadata, f, indent=2, default=str)
+
+        os.rename(tmp_dir, os.path.join(self.root, version))
+        if activate:
+            self.activate(version)
+        return version
+
+    # ---- Loading ----
+    def load_version(self, version: str) -> ModelBundle:
+        """
+        Loads a version. The forecasting model is memory-mapped from the
+        flat forest arrays when the version has them, so workers share one
+        copy; everything else is unpickled. Missing artifacts stay None.
+        """
+        directory = BASE_DIR if version == LEGACY_VERSION else os.path.join(self.root, version)
+        bundle = ModelBundle(version=version)
+        if version != LEGACY_VERSION:
+            bundle.metadata = self.metadata(version)
+        if os.path.isdir(os.path.join(directory, FOREST_DIR)):
+            from .forest import FlatForest
+            bundle.model = FlatForest.load(os.path.join(directory, FOREST_DIR))
+        for name, filename in ARTIFACTS.items():
+            if getattr(bundle, name) is not None:
+                continue
+            path = os.path.join(directory, filename)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    setattr(bundle, name, pickle.load(f))
+        return bundle
+
+    def load(self) -> ModelBundle:
+        """
+        Loads the active version (or the legacy flat files when the registry
+        is empty) and swaps it in. A version that fails to load leaves the
+        current bundle in place.
+        """
+        version = self.active_version() or LEGACY_VERSION
+        try:
+            bundle = self.load_version(version)
+        except Exception as e:
+            self.load_error = f"{version}: {e}"
+            self._failed_version = version
+            logger.error("Could not load model version %s", self.load_error)
+            if self.state != "ready":
+                self.state = "failed"
+            return self.active
+        self.load_error = None
+        self._failed_version = None
+        for name, filename in ARTIFACTS.items():
+            if getattr(bundle, name) is None:
+                logger.warning("%s not found in model version %s", filename, version)
+        # One assignment: requests see either the old or the new bundle, never a mix
+        self.active = bundle
+        self.state = "ready"
+        return bundle
+
+    async def _warm(self, on_swap: Optional[Callable[[ModelBundle], None]]):
+        # Unpickling (and importing sklearn) takes seconds; keep it off the event loop
+        await asyncio.to_thread(self.load)
+        logger.info("Model version %s loaded (%s)", self.active.version, self.state)
+        self.watch(on_swap)
+
+    def start(self, on_swap: Optional[Callable[[ModelBundle], None]] = None):
+        """
+        Loads the active version in the background, then watches ACTIVE for
+        new ones. Returns at once, so the API serves while models warm up.
+        """
+        self.state = "warming"
+        self._watcher = asyncio.create_task(self._warm(on_swap))
+
+    async def reload_if_changed(self, on_swap: Optional[Callable[[ModelBundle], None]] = None) -> bool:
+        version = self.active_version() or LEGACY_VERSION
+        # A version that failed to load is not retried until ACTIVE changes
+        if version in (self.active.version, self._failed_version):
+            return False
+        # Unpickling is slow; keep it off the event loop
+        previous = self.active
+        bundle = await asyncio.to_thread(self.load)
+        if bundle is previous:
+            return False
+        if on_swap:
+            on_swap(bundle)
+        return True
+
+    async def switch_to(self, version: str, on_swap: Optional[Callable[[ModelBundle], None]] = None) -> ModelBundle:
+        """
+        Loads a version, then makes it active and swaps it in. ACTIVE is only
+        rewritten once the version has loaded, so a broken version never
+        becomes active. Raises KeyError for unknown versions.
+        """
+        if version not in self.versions():
+            raise KeyError(version)
+        bundle = await asyncio.to_thread(self.load_version, version)
+        self.activate(version)
+        self.active = bundle
+        self.state = "ready"
+        self.load_error = None
+        self._failed_version = None
+        if on_swap:
+            on_swap(bundle)
+        return bundle
+
+    def watch(self, on_swap: Optional[Callable[[ModelBundle], None]] = None,
+              interval: float = MODEL_RELOAD_SECONDS):
+        async def poll():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.reload_if_changed(on_swap)
+                except Exception:
+                    logger.exception("Model reload failed")
+
+        self._watcher = asyncio.create_task(poll())
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    def describe(self) -> dict:
+        versions = []
+        for version in self.versions():
+            try:
+                versions.append(self.metadata(version))
+            except (OSError, ValueError):
+                versions.append({"version": version})
+        return {
+            "state": self.state,
+            "active": self.active_version(),
+            "loaded": self.active.version,
+            "load_error": self.load_error,
+            "versions": versions,
+        }
+
+
+model_registry = ModelRegistry()
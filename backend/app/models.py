@@ -1,5 +1,7 @@
 # backend/app/models.py
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -24,8 +26,12 @@ class User(Base):
 
 class Station(Base):
     __tablename__ = "stations"
+    __table_args__ = (
+        # Ingestion creates stations by name with ON CONFLICT DO NOTHING
+        Index("ix_stations_city_id_name", "city_id", "name", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    city_id = Column(Integer, ForeignKey("cities.id"))
+    city_id = Column(Integer, ForeignKey("cities.id"), index=True)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     name = Column(String)
 
@@ -43,12 +49,67 @@ class Pollutant(Base):
 
 class Measurement(Base):
     __tablename__ = "measurements"
+    __table_args__ = (
+        # One value per station/pollutant/day; value is included for index-only scans
+        Index(
+            "ix_measurements_station_pollutant_date",
+            "station_id", "pollutant_id", "date",
+            unique=True,
+            postgresql_include=["value"],
+        ),
+        # Keyset pagination seeks by (date, id)
+        Index("ix_measurements_date_id", "date", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     station_id = Column(Integer, ForeignKey("stations.id"))
     pollutant_id = Column(Integer, ForeignKey("pollutants.id"))
-    date = Column(Date, index=True)
+    date = Column(Date)
     value = Column(Float)
 
     station = relationship("Station", back_populates="measurements")
     pollutant = relationship("Pollutant", back_populates="measurements")
 
+class IngestFile(Base):
+    """Registry of ingested files, used to skip repeated uploads."""
+    __tablename__ = "ingest_files"
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, index=True) # sha256 of the raw file
+    filename = Column(String)
+    year = Column(Integer)
+    month = Column(Integer)
+    rows_processed = Column(Integer)
+    rows_changed = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class DailyRollup(Base):
+    """Per city/pollutant/day aggregates, kept up to date by ingestion."""
+    __tablename__ = "daily_rollups"
+    city_id = Column(Integer, ForeignKey("cities.id"), primary_key=True)
+    pollutant_id = Column(Integer, ForeignKey("pollutants.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    sum = Column(Float)
+    count = Column(Integer)
+    min = Column(Float)
+    max = Column(Float)
+    sketch = Column(JSONB) # {bucket: count} quantile sketch, see sketch.py
+
+class LatestMeasurement(Base):
+    """Newest measurement of every pollutant in a city, kept up to date by ingestion."""
+    __tablename__ = "latest_measurements"
+    city_id = Column(Integer, ForeignKey("cities.id"), primary_key=True)
+    pollutant_id = Column(Integer, ForeignKey("pollutants.id"), primary_key=True)
+    station_id = Column(Integer, ForeignKey("stations.id"))
+    date = Column(Date)
+    value = Column(Float)
+
+class PendingRefresh(Base):
+    """
+    (city, pollutant, day) keys whose rollups and latest values are not yet
+    refreshed. Written with the measurements, drained by refresh_changed.
+    """
+    __tablename__ = "pending_refreshes"
+    # Not unique by key: parallel uploads add theirs without waiting on each other
+    id = Column(Integer, primary_key=True)
+    city_id = Column(Integer, ForeignKey("cities.id"), nullable=False)
+    pollutant_id = Column(Integer, ForeignKey("pollutants.id"), nullable=False)
+    date = Column(Date, nullable=False)
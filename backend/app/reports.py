@@ -0,0 +1,123 @@
+# backend/app/reports.py
+import asyncio
+from datetime import date, timedelta
+from sqlalchemy import select, func
+from .db import SessionLocal
+from .models import City, Pollutant, DailyRollup
+from .ai import active_models, fetch_latest_values, classify_air_quality_many
+from .inference import inference_service
+
+# Reports summarize the recent air quality
+REPORT_DAYS = 30
+
+
+def rollup_aggregates(where=None, suffix: str = ""):
+    """
+    avg/min/max columns over daily_rollups rows. The average is weighted by
+    the per-day counts, so it equals avg() over the raw measurements.
+    With where, every aggregate gets a FILTER (WHERE ...) clause, so several
+    windows can be computed by one grouped query.
+    """
+    def aggregate(expr):
+        return expr if where is None else expr.filter(where)
+
+    return [
+        (aggregate(func.sum(DailyRollup.sum)) / func.nullif(aggregate(func.sum(DailyRollup.count)), 0)).label("avg" + suffix),
+        aggregate(func.min(DailyRollup.min)).label("min" + suffix),
+        aggregate(func.max(DailyRollup.max)).label("max" + suffix),
+    ]
+
+
+async def fetch_cities(city_ids=None) -> dict:
+    async with SessionLocal() as session:
+        query = select(City.id, City.name).order_by(City.id)
+        if city_ids is not None:
+            query = query.where(City.id.in_(city_ids))
+        result = await session.execute(query)
+        return dict(result.all())
+
+
+async def fetch_pollutant_stats(city_ids: list, date_from: date) -> dict:
+    """
+    avg/min/max of every pollutant since date_from for each city,
+    as one GROUP BY over the daily rollups: {city_id: [stats, ...]}
+    """
+    async with SessionLocal() as session:
+        query = (
+            select(
+                DailyRollup.city_id,
+                Pollutant.code,
+                *rollup_aggregates(),
+            )
+            .join(Pollutant, DailyRollup.pollutant_id == Pollutant.id)
+            .where(DailyRollup.city_id.in_(city_ids))
+            .where(DailyRollup.date >= date_from)
+            .group_by(DailyRollup.city_id, Pollutant.id, Pollutant.code)
+            .order_by(DailyRollup.city_id, Pollutant.id)
+        )
+        result = await session.execute(query)
+
+    stats = {city_id: [] for city_id in city_ids}
+    for city_id, code, avg, min_val, max_val in result.all():
+        if avg is not None:
+            stats[city_id].append({
+                "pollutant": code,
+                "avg": round(avg, 2),
+                "min": min_val,
+                "max": max_val
+            })
+    return stats
+
+
+async def fetch_latest(city_ids: list) -> dict:
+    async with SessionLocal() as session:
+        return await fetch_latest_values(session, city_ids)
+
+
+async def build_reports(city_ids=None) -> list:
+    """
+    Reports for the given cities (all cities when None), in city id order.
+    The stats aggregate and the latest-value lookup each cover every city in a
+    single query, and run concurrently on their own sessions.
+    Unknown city ids are left out.
+    """
+    # Fail fast while the models are still loading
+    quality_models = active_models().quality_models
+    cities = await fetch_cities(city_ids)
+    if not cities:
+        return []
+
+    ids = list(cities)
+    today = date.today()
+    stats, latest = await asyncio.gather(
+        fetch_pollutant_stats(ids, today - timedelta(days=REPORT_DAYS)),
+        fetch_latest(ids),
+    )
+
+    statuses = await inference_service.run(classify_air_quality_many, latest, quality_models)
+    return [
+        {
+            "city": name,
+            "date": today,
+            "status": statuses[city_id],
+            "stats": stats[city_id]
+        }
+        for city_id, name in cities.items()
+    ]
+
+
+async def build_statuses() -> list:
+    """
+    Current air-quality status of every city, for the map view.
+    """
+    quality_models = active_models().quality_models
+    cities = await fetch_cities()
+    if not cities:
+        return []
+
+    latest = await fetch_latest(list(cities))
+    statuses = await inference_service.run(classify_air_quality_many, latest, quality_models)
+    return [
+        {"city_id": city_id, "city": name, "status": statuses[city_id]}
+        for city_id, name in cities.items()
+    ]
@@ -1,6 +1,6 @@
 # backend/app/schemas.py
-from pydantic import BaseModel
-from datetime import date
+from pydantic import BaseModel, Field
+from datetime import date, datetime
 from typing import Optional, List
 
 
@@ -8,7 +8,8 @@ class MeasurementCreate(BaseModel):
     station_id: int
     pollutant_id: int
     date: date
-    value: float
+    # NaN/Infinity (and numbers like 1e400) are not measurements
+    value: float = Field(allow_inf_nan=False)
 
 
 # ---- City ----
@@ -64,6 +65,54 @@ class StatsOut(BaseModel):
     min: Optional[float]
     max: Optional[float]
 
+# ---- Batch stats ----
+class StatsWindow(BaseModel):
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+class StatsBatchRequest(BaseModel):
+    city_ids: Optional[List[int]] = None # all cities when omitted
+    pollutant_ids: Optional[List[int]] = None # all pollutants when omitted
+    windows: List[StatsWindow]
+
+class WindowStatsOut(StatsOut):
+    count: int
+
+class StatsSeriesOut(BaseModel):
+    city_id: int
+    pollutant_id: int
+    windows: List[WindowStatsOut] # same order as the requested windows
+
+class StatsBatchOut(BaseModel):
+    windows: List[StatsWindow]
+    series: List[StatsSeriesOut]
+
+# ---- Percentiles & histogram ----
+class PercentileOut(BaseModel):
+    q: float
+    value: Optional[float]
+
+class HistogramBinOut(BaseModel):
+    lo: float
+    hi: float
+    count: int
+
+class DistributionOut(BaseModel):
+    count: int
+    min: Optional[float]
+    max: Optional[float]
+    relative_accuracy: float # quantiles are within this relative error
+    percentiles: List[PercentileOut]
+    histogram: List[HistogramBinOut]
+
+# ---- Time buckets ----
+class BucketOut(BaseModel):
+    date: date # first day of the bucket
+    avg: float
+    min: float
+    max: float
+    count: int
+
 # ---- Auth & Users ----
 class Token(BaseModel):
     access_token: str
@@ -112,3 +161,19 @@ class ReportOut(BaseModel):
     stats: List[PollutantStats]
 
 
+
+
+# ---- Ingestion ----
+class IngestJobOut(BaseModel):
+    id: str
+    filename: str
+    status: str
+    progress: float
+    rows_written: int
+    rows_changed: int
+    rejected_cells: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    duration_seconds: Optional[float] = None
@@ -0,0 +1,121 @@
+# backend/app/sketch.py
+"""
+Mergeable quantile sketches (DDSketch-style) for measurement values.
+
+A value x > 0 is counted in bucket k = ceil(log_gamma(x)), which covers
+(gamma^(k-1), gamma^k]. Every bucket is answered with the same representative
+value, so any quantile is returned with a relative error of at most
+RELATIVE_ACCURACY. Values in [0, MIN_INDEXABLE] share the "z" bucket and
+are answered as 0, with an absolute error of at most MIN_INDEXABLE.
+
+Negative readings are not tracked: they also go to the "z" bucket and are
+answered as 0. /stats/distribution clamps every estimate to the exact
+[min, max] of the range, so a range whose values are all negative reports
+its min, max and count exactly, but not its percentiles.
+
+Infinity and NaN have no bucket: bucket_key returns None for them and
+bucket_sql NULL. Ingestion rejects them and the rollups leave them out.
+
+Sketches are plain {bucket: count} maps, so merging them is a sum of counts
+per bucket. Ingestion builds one per (city, pollutant, day) in SQL
+(see bucket_sql) and stores it in daily_rollups.sketch; any date range is
+answered by merging the daily sketches.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# Values up to this are counted as zero
+MIN_INDEXABLE = 1e-6
+
+ZERO_BUCKET = "z"
+
+
+def bucket_key(value: float) -> Optional[str]:
+    if value <= MIN_INDEXABLE:
+        return ZERO_BUCKET
+    if not math.isfinite(value):
+        return None
+    return str(math.ceil(math.log(value) / LOG_GAMMA))
+
+
+def bucket_sql(column: str) -> str:
+    """
+    SQL expression computing bucket_key of a double precision column.
+    Postgres sorts NaN above Infinity, so neither passes "< 'Infinity'".
+    """
+    return (
+        f"CASE WHEN {column} <= {MIN_INDEXABLE!r} THEN '{ZERO_BUCKET}' "
+        f"WHEN {column} < 'Infinity' THEN ceil(ln({column}) / {LOG_GAMMA!r})::int::text END"
+    )
+
+
+def bucket_value(key: str) -> float:
+    """Representative value of a bucket: within RELATIVE_ACCURACY of every value in it."""
+    if key == ZERO_BUCKET:
+        return 0.0
+    return 2 * GAMMA ** int(key) / (GAMMA + 1)
+
+
+class QuantileSketch:
+    def __init__(self, counts: Optional[Dict[str, int]] = None):
+        self.counts: Dict[str, int] = {}
+        if counts:
+            self.merge(counts)
+
+    @classmethod
+    def from_values(cls, values: Iterable[float]) -> "QuantileSketch":
+        sketch = cls()
+        for value in values:
+            key = bucket_key(value)
+            if key is not None:
+                sketch.counts[key] = sketch.counts.get(key, 0) + 1
+        return sketch
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts.values())
+
+    def merge(self, counts: Dict[str, int]) -> "QuantileSketch":
+        for key, n in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + int(n)
+        return self
+
+    def _sorted_buckets(self) -> List[Tuple[float, int]]:
+        return sorted((bucket_value(key), n) for key, n in self.counts.items() if n)
+
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        """
+        Values at the given quantiles (0..1). Uses the lower rank
+        q * (count - 1), like numpy's "lower" interpolation.
+        """
+        buckets = self._sorted_buckets()
+        total = sum(n for _, n in buckets)
+        result = []
+        for q in qs:
+            if not total:
+                result.append(None)
+                continue
+            rank = q * (total - 1)
+            seen = 0
+            for value, n in buckets:
+                seen += n
+                if seen > rank:
+                    result.append(value)
+                    break
+        return result
+
+    def histogram(self, lo: float, hi: float, bins: int) -> List[int]:
+        """
+        Counts in `bins` equal-width bins over [lo, hi]. Every bucket's count
+        goes to the bin of its representative value.
+        """
+        counts = [0] * bins
+        width = (hi - lo) / bins if hi > lo else 0
+        for value, n in self._sorted_buckets():
+            i = int((value - lo) / width) if width else 0
+            counts[min(max(i, 0), bins - 1)] += n
+        return counts
@@ -1,13 +1,17 @@
 import pandas as pd
 import numpy as np
 import glob
-import pickle
+import os
 from datetime import datetime, timedelta
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
 from sklearn.preprocessing import LabelEncoder
 from math import sqrt
+from app.model_registry import model_registry
+
+# Run from backend/: python -m app.train_model
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 def load_and_normalize(f):
     df = pd.read_csv(f, sep=";")
@@ -44,7 +48,7 @@ def load_and_normalize(f):
 
 
 # 1. Read all CSVs
-files = glob.glob("data/*.csv")
+files = glob.glob(os.path.join(BASE_DIR, "data", "*.csv"))
 dfs = [load_and_normalize(f) for f in files]
 data = pd.concat(dfs, ignore_index=True)
 
@@ -76,10 +80,6 @@ df_long = df_long.dropna()
 le = LabelEncoder()
 df_long["pollutant_encoded"] = le.fit_transform(df_long["pollutant"])
 
-# Save the encoder for inference
-with open("label_encoder.pkl", "wb") as f:
-    pickle.dump(le, f)
-
 # 6. Prepare Features and Target
 feature_cols = ["pollutant_encoded"] + [f"lag_{i}" for i in range(1, lags + 1)]
 X = df_long[feature_cols]
@@ -97,9 +97,16 @@ preds = model.predict(X_test)
 rmse = sqrt(mean_squared_error(y_test, preds))
 print("RMSE:", rmse)
 
-# 8. Save Model
-with open("model.pkl", "wb") as f:
-    pickle.dump(model, f)
+# 8. Publish model and encoder as a new registry version (quality models are kept)
+version = model_registry.publish(
+    {"model": model, "label_encoder": le},
+    {
+        "training_window": {"from": df_long["date"].min(), "to": df_long["date"].max()},
+        "samples": len(X),
+        "features": feature_cols,
+        "rmse": rmse,
+        "params": {"n_estimators": model.n_estimators, "random_state": 42},
+    },
+)
 
-print("✅ Model saved to model.pkl")
-print("✅ Label Encoder saved to label_encoder.pkl")
+print(f"✅ Model and Label Encoder published as version {version}")
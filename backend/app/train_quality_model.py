@@ -1,21 +1,17 @@
 import asyncio
-import os
-import pickle
 import numpy as np
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.models import Measurement, Pollutant
 from app.db import DATABASE_URL
+from app.model_registry import model_registry
 from sklearn.cluster import KMeans
 
 # Setup DB connection
 engine = create_async_engine(DATABASE_URL, echo=True)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-QUALITY_MODEL_PATH = os.path.join(BASE_DIR, "quality_models.pkl")
-
 async def train_quality_models():
     async with AsyncSessionLocal() as session:
         # 1. Get all pollutants
@@ -73,11 +69,16 @@ async def train_quality_models():
             
             print(f"  -> Trained {k} clusters. Centroids: {centroids[sorted_indices]}")
 
-        # 5. Save models
-        with open(QUALITY_MODEL_PATH, "wb") as f:
-            pickle.dump(quality_models, f)
-            
-        print(f"Saved quality models to {QUALITY_MODEL_PATH}")
+        # 5. Publish as a new registry version (the forecasting model is kept)
+        version = model_registry.publish(
+            {"quality_models": quality_models},
+            {
+                "quality_pollutants": sorted(quality_models),
+                "quality_clusters": {code: len(qm["centroids"]) for code, qm in quality_models.items()},
+            },
+        )
+
+        print(f"Published quality models as version {version}")
 
 if __name__ == "__main__":
     asyncio.run(train_quality_models())
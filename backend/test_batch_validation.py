@@ -0,0 +1,34 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api import validate_measurements, validate_ndjson_lines
+
+RECORD = b'{"station_id": 1, "pollutant_id": 2, "date": "2025-07-01", "value": %s}'
+
+
+def test_ndjson_line_with_two_records_is_rejected():
+    line = RECORD % b"1" + b"," + RECORD % b"2"
+    with pytest.raises(HTTPException) as e:
+        validate_ndjson_lines([(1, RECORD % b"0.5"), (3, line)], offset=10)
+    assert e.value.status_code == 422
+    [error] = e.value.detail
+    assert error["type"] == "json_invalid"
+    assert error["loc"] == (11,)
+    assert error["line"] == 3
+    assert isinstance(error["input"], str)
+
+
+@pytest.mark.parametrize("value", [b"NaN", b"Infinity", b"-Infinity", b"1e400", b'"inf"'])
+def test_non_finite_values_are_rejected(value):
+    with pytest.raises(HTTPException) as e:
+        validate_ndjson_lines([(1, RECORD % value)])
+    assert e.value.detail[0]["type"] == "finite_number"
+
+    with pytest.raises(HTTPException) as e:
+        validate_measurements(b"[" + RECORD % value + b"]")
+    assert e.value.detail[0]["loc"] == (0, "value")
+
+
+def test_valid_lines_are_parsed():
+    items = validate_ndjson_lines([(1, RECORD % b"0.07"), (2, RECORD % b"12")])
+    assert [item.value for item in items] == [0.07, 12.0]
@@ -0,0 +1,80 @@
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import LabelEncoder
+
+from app.forest import FlatForest, export_forest
+from app.model_registry import ModelRegistry
+
+
+def fit_forest(seed: int = 0, **params) -> RandomForestRegressor:
+    rng = np.random.default_rng(seed)
+    # Shaped like the forecasting features: [pollutant_encoded, lag_1, lag_2, lag_3]
+    X = np.column_stack([rng.integers(0, 8, 2000), rng.lognormal(-2, 1, (2000, 3))])
+    y = X[:, 1] * 0.6 + X[:, 2] * 0.3 + rng.normal(0, 0.01, 2000)
+    return RandomForestRegressor(n_estimators=20, random_state=seed, **params).fit(X, y)
+
+
+def test_flat_forest_matches_sklearn(tmp_path):
+    model = fit_forest()
+    export_forest(model, tmp_path)
+    forest = FlatForest.load(tmp_path)
+
+    rng = np.random.default_rng(1)
+    X = np.column_stack([rng.integers(0, 8, 500), rng.lognormal(-2, 1, (500, 3))])
+    # Exactly on the split thresholds, where float32 vs float64 comparisons matter
+    on_split = np.repeat(X[:1], len(model.estimators_), axis=0)
+    for row, estimator in zip(on_split, model.estimators_):
+        tree = estimator.tree_
+        row[tree.feature[0]] = tree.threshold[0]
+    X = np.vstack([X, on_split])
+
+    assert forest.n_estimators == model.n_estimators
+    np.testing.assert_allclose(forest.predict(X), model.predict(X), rtol=1e-12, atol=1e-12)
+
+
+def test_flat_forest_handles_single_leaf_trees(tmp_path):
+    model = fit_forest(max_depth=1, min_samples_split=100000)
+    export_forest(model, tmp_path)
+    X = np.array([[1, 0.1, 0.2, 0.3]])
+    np.testing.assert_allclose(FlatForest.load(tmp_path).predict(X), model.predict(X))
+
+
+def test_publish_and_load_round_trip(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path))
+    model = fit_forest()
+    encoder = LabelEncoder().fit(["NO2", "PM10", "SO2"])
+    quality_models = {"NO2": {"centroids": [[0.01], [0.05], [0.1]]}}
+
+    first = registry.publish(
+        {"model": model, "label_encoder": encoder, "quality_models": quality_models},
+        {"rmse": 0.5},
+        inherit=False,
+    )
+    # The forest is stored as flat arrays only
+    assert not (tmp_path / first / "model.pkl").exists()
+    assert "forest/value.npy" in registry.metadata(first)["files"]
+
+    bundle = registry.load_version(first)
+    X = np.array([[0, 0.1, 0.2, 0.3], [2, 1.0, 0.5, 0.1]])
+    assert isinstance(bundle.model, FlatForest)
+    np.testing.assert_allclose(bundle.model.predict(X), model.predict(X), rtol=1e-12)
+    assert list(bundle.label_encoder.classes_) == ["NO2", "PM10", "SO2"]
+    assert bundle.quality_models == quality_models
+
+    # Retraining the quality models carries the forest, the encoder and their metadata over
+    new_quality_models = {"NO2": {"centroids": [[0.02], [0.06], [0.2]]}}
+    second = registry.publish({"quality_models": new_quality_models}, {"clusters": 3})
+    assert registry.active_version() == second
+    assert registry.previous_version() == first
+
+    metadata = registry.metadata(second)
+    assert metadata["parent"] == first
+    assert metadata["rmse"] == 0.5 and metadata["clusters"] == 3
+    assert {k: v for k, v in metadata["files"].items() if k.startswith("forest/")} == {
+        k: v for k, v in registry.metadata(first)["files"].items() if k.startswith("forest/")
+    }
+
+    bundle = registry.load_version(second)
+    np.testing.assert_allclose(bundle.model.predict(X), model.predict(X), rtol=1e-12)
+    assert list(bundle.label_encoder.classes_) == ["NO2", "PM10", "SO2"]
+    assert bundle.quality_models == new_quality_models
@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+import pytest
+
+from app.inference import InferenceBusy, InferenceService, InferenceTimeout
+
+
+def test_timed_out_calls_release_their_pending_slots():
+    service = InferenceService(workers=1, max_pending=4)
+    service.start()
+
+    async def main():
+        calls = [service.run(time.sleep, 0.5, timeout=0.2) for _ in range(3)]
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        assert all(isinstance(result, InferenceTimeout) for result in results)
+        # Let the call that was already running finish
+        await asyncio.sleep(0.5)
+
+    try:
+        asyncio.run(main())
+        assert service.pending == 0
+        assert service.timeouts == 3
+    finally:
+        service.stop()
+
+
+def test_saturated_service_rejects_new_calls():
+    service = InferenceService(workers=1, max_pending=1)
+    service.start()
+
+    async def main():
+        running = asyncio.ensure_future(service.run(time.sleep, 0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(InferenceBusy):
+            await service.run(time.sleep, 0)
+        await running
+
+    try:
+        asyncio.run(main())
+        assert service.pending == 0
+        assert service.rejected == 1
+    finally:
+        service.stop()
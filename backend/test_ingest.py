@@ -0,0 +1,102 @@
+import io
+import os
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from app.api import map_date_columns
+from app.ingest import iter_csv_chunks, iter_xlsx_chunks, melt_measurements, sniff_csv_format
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "app", "data")
+HEADER = "city;coordinateNumber;nameImpurity;1August;2August\n"
+
+
+def test_sniff_utf8_with_bom():
+    sample = ("\ufeff" + HEADER + "Київ;5053050;Пил;0,07;-\n").encode("utf-8")
+    assert sniff_csv_format(sample) == ("utf-8", ";")
+
+
+def test_sniff_cp1251():
+    sample = (HEADER + "Київ;5053050;Пил;0,07;-\n").encode("cp1251")
+    assert sniff_csv_format(sample) == ("cp1251", ";")
+
+
+def test_sniff_comma_separator():
+    sample = HEADER.replace(";", ",").encode("utf-8")
+    assert sniff_csv_format(sample) == ("utf-8", ",")
+
+
+def test_sniff_multibyte_character_cut_at_end_of_sample():
+    sample = (HEADER + "Київ").encode("utf-8")[:-1]
+    assert sniff_csv_format(sample) == ("utf-8", ";")
+
+
+def test_sniff_rejects_single_column():
+    assert sniff_csv_format(b"just some text\n") is None
+    assert sniff_csv_format(b"") is None
+
+
+def test_csv_chunks_drop_bom_and_keep_cells_as_text():
+    data = ("\ufeff" + HEADER + "Київ;5053050;Пил;0,07;-\nКиїв;;Пил;1;2\n").encode("utf-8")
+    [chunk] = list(iter_csv_chunks(io.BytesIO(data)))
+    assert chunk.columns[0] == "city"
+    # Read as text, a column with an empty cell isn't turned into floats
+    assert chunk["coordinateNumber"].tolist()[0] == "5053050"
+
+
+def test_station_names_are_not_read_as_floats():
+    # The file has rows without a station; parsed as numbers, the others
+    # used to become "5053050.0"
+    with open(os.path.join(DATA_DIR, "shchodenni-za-serpen-2024.csv"), "rb") as fh:
+        chunk = next(iter_csv_chunks(fh))
+    frame = melt_measurements(chunk, map_date_columns(chunk.columns, 2024, 8))
+    assert "5053050" in set(frame["station"])
+    assert not frame["station"].str.endswith(".0").any()
+
+
+def test_melt_cleans_values_and_counts_rejected_cells():
+    df = pd.DataFrame({
+        "city": ["Київ", "Київ", "Київ"],
+        "coordinateNumber": ["1", "2", ""],
+        "nameImpurity": ["Пил", "Пил", "Пил"],
+        "1August": ["0,07", "<0,01", "5"],
+        "2August": ["-", "abc", "6"],
+        "3August": ["null", "inf", "7"],
+        "4August": [None, ">2", "8"],
+    })
+    date_columns = map_date_columns(df.columns, 2024, 8)
+    frame = melt_measurements(df, date_columns)
+
+    values = {(row.station, row.date.day): row.value for row in frame.itertuples()}
+    assert values == {("1", 1): 0.07, ("2", 1): 0.01, ("2", 4): 2.0}
+    # "abc" and "inf"; empty cells and the row without a station don't count
+    assert frame.attrs["rejected_cells"] == 2
+
+
+def test_melt_without_date_columns_is_empty():
+    df = pd.DataFrame({"city": ["Київ"], "coordinateNumber": ["1"], "nameImpurity": ["Пил"]})
+    frame = melt_measurements(df, map_date_columns(df.columns, 2024, 8))
+    assert frame.empty
+    assert list(frame.columns) == ["city", "station", "pollutant", "date", "value"]
+
+
+def test_xlsx_headers_that_are_dates():
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["city", "coordinateNumber", "nameImpurity", datetime(2024, 8, 1), 2, None])
+    sheet.append(["Київ", 5053050, "Пил", 0.5, "0,7", None])
+    sheet.append([None] * 6)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+
+    [chunk] = list(iter_xlsx_chunks(buffer))
+    assert chunk.attrs["progress"] == 1.0
+    date_columns = map_date_columns(chunk.columns, 2024, 8)
+    assert sorted(date_columns.values()) == [date(2024, 8, 1), date(2024, 8, 2)]
+
+    frame = melt_measurements(chunk, date_columns)
+    assert frame["station"].tolist() == ["5053050", "5053050"]
+    assert sorted(frame["value"]) == [0.5, 0.7]
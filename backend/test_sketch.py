@@ -0,0 +1,78 @@
+import asyncio
+import math
+import os
+import random
+
+import numpy as np
+import pytest
+
+from app.sketch import MIN_INDEXABLE, RELATIVE_ACCURACY, QuantileSketch, bucket_key, bucket_sql
+
+QUANTILES = [0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1]
+
+
+def test_quantiles_within_relative_accuracy():
+    rng = np.random.default_rng(42)
+    values = np.concatenate([rng.lognormal(mean=-3, sigma=2, size=20000), rng.uniform(0.01, 500, size=5000)])
+    sketch = QuantileSketch.from_values(values.tolist())
+
+    exact = np.quantile(values, QUANTILES, method="lower")
+    for q, expected, estimate in zip(QUANTILES, exact, sketch.quantiles(QUANTILES)):
+        assert abs(estimate - expected) <= RELATIVE_ACCURACY * expected * (1 + 1e-9), q
+
+
+def test_values_up_to_min_indexable_are_answered_as_zero():
+    sketch = QuantileSketch.from_values([0.0, MIN_INDEXABLE / 2, MIN_INDEXABLE])
+    assert sketch.quantiles([0, 0.5, 1]) == [0.0, 0.0, 0.0]
+    assert QuantileSketch().quantiles([0.5]) == [None]
+
+
+def test_non_finite_values_are_not_counted():
+    sketch = QuantileSketch.from_values([1.0, math.inf, math.nan, 2.0])
+    assert sketch.count == 2
+    assert bucket_key(math.inf) is None and bucket_key(math.nan) is None
+
+
+def test_merge_is_order_independent():
+    rng = np.random.default_rng(7)
+    days = [rng.lognormal(size=rng.integers(1, 300)).tolist() for _ in range(30)]
+    everything = QuantileSketch.from_values([value for day in days for value in day])
+
+    daily = [QuantileSketch.from_values(day).counts for day in days]
+    for seed in range(5):
+        random.Random(seed).shuffle(daily)
+        merged = QuantileSketch()
+        for counts in daily:
+            merged.merge(counts)
+        assert merged.counts == everything.counts
+        assert merged.quantiles(QUANTILES) == everything.quantiles(QUANTILES)
+
+
+def _postgres_buckets(values):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async def fetch():
+        engine = create_async_engine(os.environ["DATABASE_URL"])
+        try:
+            async with engine.connect() as conn:
+                res = await conn.execute(
+                    text(f"SELECT {bucket_sql('v')} FROM unnest(CAST(:values AS double precision[])) "
+                         "WITH ORDINALITY AS t(v, i) ORDER BY i"),
+                    {"values": values},
+                )
+                return [row[0] for row in res.all()]
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(fetch())
+
+
+@pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="needs DATABASE_URL pointing at Postgres")
+def test_bucket_sql_matches_bucket_key():
+    rng = np.random.default_rng(3)
+    values = [-5.0, -MIN_INDEXABLE, 0.0, MIN_INDEXABLE, MIN_INDEXABLE * 1.5, 0.001, 1.0, 2.5, 1000.0]
+    values += [math.inf, -math.inf, math.nan]
+    values += rng.lognormal(mean=0, sigma=4, size=5000).tolist()
+
+    assert _postgres_buckets(values) == [bucket_key(value) for value in values]
@@ -5,6 +5,7 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy import select
 from app.db import DATABASE_URL
 from app.ai import get_current_air_quality_status
+from app.inference import inference_service
 from app.models import City
 
 # Setup DB connection
@@ -12,6 +13,8 @@ engine = create_async_engine(DATABASE_URL, echo=False)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 async def verify():
+    # Status classification runs in the inference pool
+    inference_service.start()
     async with AsyncSessionLocal() as session:
         # Get a city
         res = await session.execute(select(City).limit(1))